@@ -0,0 +1,143 @@
+# app/accounts/batch.py
+#
+# Batch money movement for payroll/settlement style jobs.
+#
+# Operations are validated in-process with the account models against one
+# snapshot read, then applied as a single unordered bulk_write with one
+# conditional update per account. Each update only matches if the balance
+# is still the one we validated against, so the per-type rules hold even
+# with concurrent writers; accounts that moved underneath us are re-read and
+# retried a few times before their operations are reported as failed. Each
+# attempt's updates and ledger entries commit in one transaction.
+
+from collections import defaultdict
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from app.core.database import accounts_collection, run_in_transaction
+from app.accounts.logic import build_account, balance_update
+from app.accounts.ledger import record_entries
+
+MAX_ATTEMPTS = 3
+# Markers kept on each account so a partially matched bulk_write can be
+# attributed back to individual accounts without a per-op round trip.
+RECENT_BATCHES_KEPT = 16
+
+
+def _result(index, account_id, error=None, balance=None):
+    return {
+        "index": index,
+        "account_id": account_id,
+        "status": "failed" if error else "ok",
+        "error": error,
+        "balance": balance,
+    }
+
+
+def _simulate(doc, ops):
+    """Run ops against a model of `doc`; return (results, ledger entries, end balance)."""
+    try:
+        account = build_account(doc)
+    except ValueError as e:
+        return [_result(index, op["account_id"], error=str(e)) for index, op in ops], [], doc["balance"]
+    results = []
+    for index, op in ops:
+        try:
+            if op["type"] == "deposit":
+                account.deposit(op["amount"])
+            else:
+                account.withdraw(op["amount"])
+        except ValueError as e:
+            results.append(_result(index, op["account_id"], error=str(e)))
+        else:
+            results.append(_result(index, op["account_id"], balance=account.balance))
+    return results, account.transactions, account.balance
+
+
+async def apply_batch(owner_id, operations, session=None):
+    """Apply a list of {"account_id", "type", "amount"} dicts for one owner.
+
+    Returns per-item results in request order.
+    """
+    results = [None] * len(operations)
+    pending = defaultdict(list)  # ObjectId -> [(index, op)]
+    for index, op in enumerate(operations):
+        try:
+            pending[ObjectId(op["account_id"])].append((index, op))
+        except (InvalidId, TypeError):
+            results[index] = _result(index, op["account_id"], error="Invalid account id")
+
+    batch_id = ObjectId()
+
+    for _ in range(MAX_ATTEMPTS):
+        if not pending:
+            break
+
+        docs = {
+            doc["_id"]: doc
+            async for doc in accounts_collection.find(
+                {"_id": {"$in": list(pending)}, "owner_id": owner_id},
+                {"account_type": 1, "balance": 1, "maturity_date": 1, "owner_id": 1},
+                session=session,
+            )
+        }
+
+        updates, outcomes = [], {}
+        for account_id, ops in list(pending.items()):
+            doc = docs.get(account_id)
+            if doc is None:
+                for index, op in ops:
+                    results[index] = _result(index, op["account_id"], error="Account not found")
+                del pending[account_id]
+                continue
+
+            op_results, entries, end_balance = _simulate(doc, ops)
+            if not entries:
+                # Nothing valid to apply; the failures are final
+                for item in op_results:
+                    results[item["index"]] = item
+                del pending[account_id]
+                continue
+
+            for entry in entries:
+                entry["_id"] = ObjectId()
+                entry["account_id"] = account_id
+                entry["owner_id"] = owner_id
+            outcomes[account_id] = (op_results, entries)
+            update = balance_update(end_balance - doc["balance"], last_entry_id=entries[-1]["_id"])
+            update["$push"] = {"recent_batches": {"$each": [batch_id], "$slice": -RECENT_BATCHES_KEPT}}
+            updates.append(UpdateOne(
+                {"_id": account_id, "owner_id": owner_id, "balance": doc["balance"]},
+                update,
+            ))
+
+        if not updates:
+            break
+
+        # The balance updates and their ledger entries commit together
+        async def _commit(session):
+            result = await accounts_collection.bulk_write(updates, ordered=False, session=session)
+            if result.matched_count == len(updates):
+                applied = set(outcomes)
+            else:
+                # Some balances moved since our snapshot; find out which updates landed
+                applied = {
+                    doc["_id"]
+                    async for doc in accounts_collection.find(
+                        {"_id": {"$in": list(outcomes)}, "recent_batches": batch_id}, {"_id": 1}, session=session
+                    )
+                }
+            await record_entries([e for account_id in applied for e in outcomes[account_id][1]], session=session)
+            return applied
+
+        for account_id in await run_in_transaction(_commit, session):
+            op_results, _ = outcomes[account_id]
+            for item in op_results:
+                results[item["index"]] = item
+            del pending[account_id]
+
+    for ops in pending.values():
+        for index, op in ops:
+            results[index] = _result(index, op["account_id"], error="Account is busy, please retry")
+    return results
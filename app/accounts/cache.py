@@ -0,0 +1,83 @@
+# app/accounts/cache.py
+#
+# Every balance-changing write bumps the account's `version` counter in the
+# same $inc. The version is the balance endpoint's ETag. The same update
+# records the id of the newest ledger entry, which tags the latest history
+# page (see routes.py).
+#
+# This in-process cache remembers (owner, version, balance, last entry) per
+# account, so a poll carrying a current If-None-Match gets a 304 without
+# reaching Mongo. It is write-through: the write routes put the document
+# their update returned. Reads fill it on a miss. Versions only grow, so
+# put() keeps whichever entry has the higher version, even an expired one.
+# A fill from a lagging secondary therefore can never replace a newer write.
+# The TTL bounds staleness from writes made by other workers.
+
+import hashlib
+import time
+from collections import OrderedDict
+
+from app.core.config import BALANCE_CACHE_SIZE, BALANCE_CACHE_TTL_SECONDS
+
+
+class BalanceCache:
+    def __init__(self, maxsize=BALANCE_CACHE_SIZE, ttl_seconds=BALANCE_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # account_id -> (expires_at, owner_id, version, balance, last_entry_id)
+        self._entries = OrderedDict()
+
+    def get(self, account_id):
+        """(owner_id, version, balance, last_entry_id) while fresh, else None."""
+        entry = self._entries.get(account_id)
+        if entry is None or entry[0] <= time.monotonic():
+            # Expired entries stay until evicted, as a version floor for put()
+            self.misses += 1
+            return None
+        self._entries.move_to_end(account_id)
+        self.hits += 1
+        return entry[1:]
+
+    def put(self, account_id, owner_id, version, balance, last_entry_id=None):
+        """Store unless a higher version is known; returns the entry kept."""
+        account_id = str(account_id)
+        current = self._entries.get(account_id)
+        if current is not None and current[1] == owner_id:
+            if current[2] > version:
+                return current[1:]
+            if current[2] == version and last_entry_id is None:
+                last_entry_id = current[4]
+        entry = (time.monotonic() + self.ttl_seconds, owner_id, version, balance, last_entry_id)
+        self._entries[account_id] = entry
+        self._entries.move_to_end(account_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry[1:]
+
+    def invalidate(self, *account_ids):
+        # For writes whose resulting version is unknown (failures, batches)
+        for account_id in account_ids:
+            self._entries.pop(str(account_id), None)
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+balance_cache = BalanceCache()
+
+
+def make_etag(account_id, version, variant=None):
+    tag = f"{account_id}-{version}"
+    if variant:
+        tag = f"{tag}-{hashlib.blake2s(variant.encode(), digest_size=6).hexdigest()}"
+    return f'"{tag}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,264 @@
+# app/accounts/events.py
+#
+# Live balance and ledger events for the SSE endpoint.
+#
+# Each worker runs one change stream on the database, filtered to balance
+# updates on accounts and inserts into the ledger. It fans events out to
+# subscribers through bounded per-client queues, so open connections cost a
+# queue each rather than a change stream each. The watcher resumes from its
+# last resume token after a stream error.
+#
+# Event ids are change-stream resume tokens. A reconnecting client sends the
+# last id it saw:
+# - if the id is in the bounded in-memory replay buffer, the missed events
+#   are replayed from it
+# - otherwise, a short-lived catch-up stream is opened from that token. It
+#   feeds the client until it reaches an event the shared watcher has
+#   buffered, then hands the client over to the shared watcher
+# The shared watcher only ever resumes from tokens it got from the server
+# itself. A client token may be stale or malformed, and the one stream every
+# client depends on must not retry it forever. A "resync" event, telling the
+# client to refetch, is sent when the catch-up stream cannot use the token. The watcher and buffer are kept for
+# EVENT_IDLE_GRACE_SECONDS after the last client leaves, so quick reconnects
+# are served from memory.
+
+import asyncio
+import json
+import logging
+from collections import defaultdict, deque
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import EVENT_QUEUE_SIZE, EVENT_REPLAY_SIZE, EVENT_IDLE_GRACE_SECONDS
+from app.core.database import db
+
+logger = logging.getLogger(__name__)
+
+PIPELINE = [
+    {"$match": {"$or": [
+        {"ns.coll": "accounts", "operationType": "update",
+         "updateDescription.updatedFields.balance": {"$exists": True}},
+        {"ns.coll": "transactions", "operationType": "insert"},
+    ]}},
+    {"$project": {
+        "ns": 1,
+        "documentKey": 1,
+        "updateDescription.updatedFields.balance": 1,
+        "updateDescription.updatedFields.version": 1,
+        "fullDocument": 1,
+    }},
+]
+
+RESYNC = (None, "resync", {})
+# InvalidResumeToken / ChangeStreamFatalError / ChangeStreamHistoryLost: the
+# token cannot be resumed
+UNRESUMABLE_CODES = {260, 280, 286}
+
+
+def _to_event(change):
+    """(event_id, account_id, name, payload) for a change document."""
+    event_id = change["_id"]["_data"]
+    if change["ns"]["coll"] == "accounts":
+        account_id = str(change["documentKey"]["_id"])
+        fields = change["updateDescription"]["updatedFields"]
+        return event_id, account_id, "balance", {
+            "account_id": account_id,
+            "balance": fields["balance"],
+            "version": fields.get("version"),
+        }
+    entry = change["fullDocument"]
+    account_id = str(entry["account_id"])
+    return event_id, account_id, "transaction", {
+        "account_id": account_id,
+        "id": str(entry["_id"]),
+        "timestamp": entry["timestamp"].isoformat(),
+        "type": entry["type"],
+        "amount": entry["amount"],
+        "balance": entry.get("balance"),
+    }
+
+
+def format_sse(event_id, name, payload):
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {name}")
+    lines.append(f"data: {json.dumps(payload)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class BalanceEventHub:
+    def __init__(self, queue_size=EVENT_QUEUE_SIZE, replay_size=EVENT_REPLAY_SIZE,
+                 idle_grace_seconds=EVENT_IDLE_GRACE_SECONDS):
+        self.queue_size = queue_size
+        self.idle_grace_seconds = idle_grace_seconds
+        self.subscribers = defaultdict(set)  # account_id -> {asyncio.Queue}
+        self.replay = deque(maxlen=replay_size)  # (event_id, account_id, name, payload)
+        self.resume_token = None
+        self._task = None
+        self._live = False  # the shared watcher's stream is open
+        self._fresh_starts = 0  # times it opened from now rather than a token
+        self._idle_stop = None
+        self._catchups = {}  # queue -> catch-up task
+
+    def subscribe(self, account_id, last_event_id=None):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if self._idle_stop is not None:
+            self._idle_stop.cancel()
+            self._idle_stop = None
+        watching = self._task is not None and not self._task.done()
+
+        if not watching:
+            self._task = asyncio.create_task(self._watch())
+
+        if last_event_id and not self._in_replay(last_event_id):
+            self._catchups[queue] = asyncio.create_task(self._catch_up(queue, account_id, last_event_id))
+            return queue
+        if last_event_id:
+            self._replay_into(queue, account_id, last_event_id)
+        self.subscribers[account_id].add(queue)
+        return queue
+
+    def unsubscribe(self, account_id, queue):
+        catchup = self._catchups.pop(queue, None)
+        if catchup is not None:
+            catchup.cancel()
+        queues = self.subscribers.get(account_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[account_id]
+        if not self.subscribers and not self._catchups and self._idle_stop is None:
+            self._idle_stop = asyncio.get_running_loop().call_later(self.idle_grace_seconds, self.stop)
+
+    def stop(self):
+        if self._idle_stop is not None:
+            self._idle_stop.cancel()
+            self._idle_stop = None
+        for catchup in self._catchups.values():
+            catchup.cancel()
+        self._catchups.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._live = False
+        # Nobody is listening, so there is nothing to resume for; reconnecting
+        # clients catch up from their own token
+        self.resume_token = None
+        self.replay.clear()
+
+    def _in_replay(self, event_id):
+        return any(event[0] == event_id for event in self.replay)
+
+    def _replay_into(self, queue, account_id, last_event_id, inclusive=False):
+        ids = [event[0] for event in self.replay]
+        if last_event_id not in ids:
+            self._offer(queue, RESYNC)
+            return
+        start = ids.index(last_event_id) + (0 if inclusive else 1)
+        for event_id, event_account, name, payload in list(self.replay)[start:]:
+            if event_account == account_id:
+                self._offer(queue, (event_id, name, payload))
+
+    def _join(self, queue, account_id, after_id=None, inclusive=False):
+        # No await between the replay and the registration, so the shared
+        # watcher cannot dispatch an event in between
+        self._catchups.pop(queue, None)
+        if after_id:
+            self._replay_into(queue, account_id, after_id, inclusive=inclusive)
+        self.subscribers[account_id].add(queue)
+
+    async def _catch_up(self, queue, account_id, last_event_id):
+        """Feed `queue` from its own stream until it meets the shared watcher."""
+        last_seen = None
+        seen_before = None  # self._fresh_starts when last_seen was read
+        try:
+            async with await db.watch(PIPELINE, resume_after={"_data": last_event_id}) as stream:
+                while True:
+                    change = await stream.try_next()
+                    if change is None:
+                        # Up to date. Hand over once the shared watcher is
+                        # open (so it has everything from here on) and has
+                        # also got this far (so nothing is sent twice).
+                        if not self._live:
+                            await asyncio.sleep(0.05)
+                            continue
+                        if last_seen is None or seen_before != self._fresh_starts:
+                            # Either nothing was missed, or the watcher has
+                            # started from now since last_seen and will never
+                            # buffer it; anything newer this stream would
+                            # have read
+                            return self._join(queue, account_id)
+                        if self._in_replay(last_seen):
+                            return self._join(queue, account_id, after_id=last_seen)
+                        await asyncio.sleep(0.05)
+                        continue
+                    event_id, event_account, name, payload = _to_event(change)
+                    if self._in_replay(event_id):
+                        # The shared buffer has everything from here on
+                        return self._join(queue, account_id, after_id=event_id, inclusive=True)
+                    last_seen, seen_before = event_id, self._fresh_starts
+                    if event_account == account_id:
+                        self._offer(queue, (event_id, name, payload))
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code not in UNRESUMABLE_CODES:
+                logger.exception("Catch-up stream failed; resyncing client")
+            self._offer(queue, RESYNC)
+            self._join(queue, account_id)
+        except PyMongoError:
+            logger.exception("Catch-up stream failed; resyncing client")
+            self._offer(queue, RESYNC)
+            self._join(queue, account_id)
+
+    def _offer(self, queue, item):
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Slow consumer: drop what it has not read and tell it to refetch
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    def _dispatch(self, change):
+        event_id, account_id, name, payload = _to_event(change)
+        self.replay.append((event_id, account_id, name, payload))
+        for queue in self.subscribers.get(account_id, ()):
+            self._offer(queue, (event_id, name, payload))
+
+    async def _watch(self):
+        backoff = 0.5
+        while True:
+            try:
+                async with await db.watch(PIPELINE, resume_after=self.resume_token) as stream:
+                    self._live = True
+                    if self.resume_token is None:
+                        self._fresh_starts += 1
+                    backoff = 0.5
+                    async for change in stream:
+                        self.resume_token = stream.resume_token
+                        self._dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                self._live = False
+                if e.code not in UNRESUMABLE_CODES:
+                    logger.exception("Change stream interrupted; resuming")
+                else:
+                    # Start over from now; everyone may have missed events
+                    logger.warning("Change stream history lost; resyncing subscribers")
+                    self.resume_token = None
+                    self.replay.clear()
+                    for queues in self.subscribers.values():
+                        for queue in queues:
+                            self._offer(queue, RESYNC)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            except PyMongoError:
+                self._live = False
+                logger.exception("Change stream interrupted; resuming")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+event_hub = BalanceEventHub()
@@ -0,0 +1,267 @@
+# app/accounts/interest.py
+#
+# Nightly interest job: accrues savings interest and settles matured fixed
+# deposits.
+#
+# Accounts are streamed from Mongo in _id order in large batches. Each batch
+# is turned into NumPy arrays and the interest is computed for the whole batch
+# at once. The results are written back in chunks of ACCRUAL_WRITE_CHUNK
+# accounts, each one unordered bulk_write plus one ledger insert_many in a
+# single transaction. Keeping transactions small limits write conflicts with
+# live deposits. The writes for batch N overlap the read of batch N+1. Every update is guarded on the account's
+# last accrual/settlement marker and on the balance it was computed from, so
+# re-running a batch is a no-op and ledger running balances are exact.
+# Accounts whose balance moved between the read and the write are re-read
+# and retried, as in batch.py, and only updates that landed get a ledger
+# entry. A checkpoint with the last _id is stored after each batch, so an
+# interrupted run resumes where it stopped.
+#
+#   python -m app.accounts.interest [--run-date YYYY-MM-DD] [--batch-size N]
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.config import (
+    SAVINGS_INTEREST_RATE,
+    FIXED_DEPOSIT_INTEREST_RATE,
+    ACCRUAL_BATCH_SIZE,
+    ACCRUAL_WRITE_CHUNK,
+)
+from app.core.database import db, accounts_collection, close_client, run_in_transaction
+from app.accounts.ledger import record_entries
+from app.accounts.models import make_entry
+from app.accounts.logic import balance_update
+
+SECONDS_PER_YEAR = 365 * 24 * 3600
+MAX_ATTEMPTS = 3
+PROJECTION = {
+    "owner_id": 1, "account_type": 1, "balance": 1, "created_at": 1,
+    "maturity_date": 1, "interest_accrued_at": 1, "settled_at": 1,
+}
+
+
+def _timestamps(values):
+    return np.array([v.timestamp() if v else np.nan for v in values], dtype=np.float64)
+
+
+def compute_interest(docs, run_at):
+    """Vectorised interest for one batch; returns an array aligned with docs (0 = nothing due)."""
+    n = len(docs)
+    balance = np.fromiter((d["balance"] for d in docs), dtype=np.float64, count=n)
+    is_savings = np.fromiter((d["account_type"] == "savings" for d in docs), dtype=bool, count=n)
+    created = _timestamps([d.get("created_at") for d in docs])
+    accrued = _timestamps([d.get("interest_accrued_at") for d in docs])
+    maturity = _timestamps([d.get("maturity_date") for d in docs])
+    settled = np.fromiter((d.get("settled_at") is not None for d in docs), dtype=bool, count=n)
+    now = run_at.timestamp()
+
+    # Savings: simple daily interest since the last accrual (or opening)
+    since = np.where(np.isnan(accrued), created, accrued)
+    savings_years = np.clip(now - since, 0, None) / SECONDS_PER_YEAR
+    savings = balance * SAVINGS_INTEREST_RATE * savings_years
+
+    # Fixed deposits: full-term interest, paid once at maturity
+    matured = ~is_savings & ~settled & (maturity <= now)
+    fixed_years = np.clip(maturity - created, 0, None) / SECONDS_PER_YEAR
+    fixed = np.where(matured, balance * FIXED_DEPOSIT_INTEREST_RATE * fixed_years, 0.0)
+
+    interest = np.where(is_savings, savings, fixed)
+    return np.round(np.nan_to_num(interest, nan=0.0), 2)
+
+
+def due_query(run_at):
+    """Accounts that still owe interest or settlement for run_at."""
+    return {
+        "account_type": {"$in": ["savings", "fixed"]},
+        "$or": [
+            {"account_type": "savings", "interest_accrued_at": {"$not": {"$gte": run_at}}},
+            {"account_type": "fixed", "settled_at": None, "maturity_date": {"$lte": run_at}},
+        ],
+    }
+
+
+def build_writes(docs, interest, run_at, write_id, written_at=None):
+    """Return [(account_id, UpdateOne, ledger entry or None)] for the accounts that are due.
+
+    run_at is only the accrual/settlement marker. Entries are stamped with
+    the write time, because their running balance includes every deposit
+    and withdrawal made up to the write, which may come after run_at.
+    """
+    written_at = written_at or datetime.now()
+    writes = []
+    for doc, amount in zip(docs, interest.tolist()):
+        if doc["account_type"] == "savings":
+            if amount <= 0:
+                continue
+            # Guard on the previous marker so a re-run cannot pay twice
+            guard = {"interest_accrued_at": doc.get("interest_accrued_at")}
+            marker = {"interest_accrued_at": run_at}
+        else:
+            guard = {"settled_at": None}
+            marker = {"settled_at": run_at}
+            if doc.get("settled_at") is not None or doc.get("maturity_date") is None \
+                    or doc["maturity_date"] > run_at:
+                continue
+        # Also guard on the balance, so the entry's running balance is exact;
+        # accrual_write tells us afterwards which updates landed
+        entry = None
+        if amount > 0:
+            entry = make_entry("interest", amount, doc["balance"] + amount, when=written_at)
+            entry["_id"] = ObjectId()
+            entry["account_id"] = doc["_id"]
+            entry["owner_id"] = doc["owner_id"]
+        update = UpdateOne(
+            {"_id": doc["_id"], "balance": doc["balance"], **guard},
+            balance_update(amount, entry["_id"] if entry else None, **marker, accrual_write=write_id),
+        )
+        writes.append((doc["_id"], update, entry))
+    return writes
+
+
+async def _commit(writes, write_id):
+    """Apply one set of writes and their ledger entries atomically; return the applied ids."""
+    async def _write(session):
+        result = await accounts_collection.bulk_write([w[1] for w in writes], ordered=False, session=session)
+        ids = [w[0] for w in writes]
+        if result.matched_count == len(writes):
+            applied = set(ids)
+        else:
+            applied = {
+                doc["_id"]
+                async for doc in accounts_collection.find(
+                    {"_id": {"$in": ids}, "accrual_write": write_id}, {"_id": 1}, session=session
+                )
+            }
+        await record_entries(
+            [entry for account_id, _, entry in writes if entry is not None and account_id in applied],
+            session=session,
+        )
+        return applied
+
+    return await run_in_transaction(_write)
+
+
+async def accrue_batch(docs, run_at, chunk_size=ACCRUAL_WRITE_CHUNK):
+    """Credit one read batch, in transactions of chunk_size accounts; returns (credited, skipped)."""
+    credited = skipped = 0
+    for start in range(0, len(docs), chunk_size):
+        chunk_credited, chunk_skipped = await _accrue_chunk(docs[start:start + chunk_size], run_at)
+        credited += chunk_credited
+        skipped += chunk_skipped
+    return credited, skipped
+
+
+async def _accrue_chunk(docs, run_at):
+    """Credit one chunk of accounts.
+
+    Accounts whose balance changed since `docs` was read are re-read and
+    recomputed, up to MAX_ATTEMPTS. Accounts still moving after that are
+    left unaccrued for the next run.
+    """
+    credited, pending = 0.0, []
+    for _ in range(MAX_ATTEMPTS):
+        write_id = ObjectId()
+        writes = build_writes(docs, compute_interest(docs, run_at), run_at, write_id)
+        if not writes:
+            return credited, 0
+        applied = await _commit(writes, write_id)
+        credited += sum(entry["amount"] for account_id, _, entry in writes if entry and account_id in applied)
+        pending = [account_id for account_id, _, _ in writes if account_id not in applied]
+        if not pending:
+            return credited, 0
+        # Already-accrued accounts drop out of the due query here
+        docs = await accounts_collection.find(
+            {"_id": {"$in": pending}, **due_query(run_at)}, PROJECTION
+        ).to_list(None)
+        if not docs:
+            return credited, 0
+    return credited, len(pending)
+
+
+async def run_accrual(run_date=None, batch_size=ACCRUAL_BATCH_SIZE, log=print):
+    """Run (or resume) the accrual job for run_date; returns a summary dict."""
+    run_at = datetime.combine(run_date or datetime.now().date(), datetime.min.time())
+    checkpoints = db["job_checkpoints"]
+    job_id = f"interest:{run_at.date().isoformat()}"
+    checkpoint = await checkpoints.find_one({"_id": job_id}) or {}
+    if checkpoint.get("done"):
+        log(f"{job_id} already completed")
+        return checkpoint
+
+    query = due_query(run_at)
+    if checkpoint.get("last_id"):
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+
+    totals = {
+        "processed": checkpoint.get("processed", 0),
+        "credited": checkpoint.get("credited", 0.0),
+        "skipped": checkpoint.get("skipped", 0),
+    }
+    started = time.perf_counter()
+    pending_write = None
+    batch = []
+
+    async def write_and_checkpoint(batch):
+        credited, skipped = await accrue_batch(batch, run_at)
+        totals["processed"] += len(batch)
+        totals["credited"] += credited
+        totals["skipped"] += skipped
+        # Checkpoint only once the batch is durably written
+        await checkpoints.update_one(
+            {"_id": job_id},
+            {"$set": {"last_id": batch[-1]["_id"], **totals, "updated_at": datetime.now()}},
+            upsert=True,
+        )
+
+    async def flush(batch):
+        nonlocal pending_write
+        # Keep at most one batch in flight so writes overlap the next read
+        if pending_write is not None:
+            await pending_write
+        pending_write = asyncio.ensure_future(write_and_checkpoint(batch))
+        processed = totals["processed"] + len(batch)
+        elapsed = time.perf_counter() - started
+        log(f"{processed} accounts, {processed / elapsed if elapsed else 0:,.0f} accounts/s")
+
+    cursor = accounts_collection.find(query, PROJECTION, sort=[("_id", 1)], batch_size=batch_size)
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+    if pending_write is not None:
+        await pending_write
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "processed": totals["processed"],
+        "credited": round(totals["credited"], 2),
+        "skipped": totals["skipped"],
+        "seconds": round(elapsed, 3),
+        "accounts_per_second": round(totals["processed"] / elapsed, 1) if elapsed else None,
+    }
+    await checkpoints.update_one({"_id": job_id}, {"$set": {**summary, "done": True}}, upsert=True)
+    return summary
+
+
+async def _main(argv=None):
+    parser = argparse.ArgumentParser(description="Accrue savings interest and settle matured fixed deposits")
+    parser.add_argument("--run-date", type=lambda v: datetime.strptime(v, "%Y-%m-%d").date())
+    parser.add_argument("--batch-size", type=int, default=ACCRUAL_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    try:
+        summary = await run_accrual(args.run_date, args.batch_size)
+        print(summary)
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,262 @@
+# app/accounts/ledger.py
+#
+# Transaction history lives in its own append-only collection instead of an
+# ever-growing array on the account document. Writes are a single insert and
+# reads are keyset-paginated on (timestamp, _id), so both stay cheap no matter
+# how old the account is.
+
+import asyncio
+import base64
+import re
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from app.core.database import (
+    accounts_collection,
+    transactions_collection,
+    transactions_read_collection,
+    close_client,
+    run_in_transaction,
+)
+from app.accounts.models import make_entry
+from app.accounts.rollups import CREDIT_TYPES, apply_entries, backfill
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+async def record_entry(account, kind, amount, entry_id=None, session=None):
+    """Append a ledger entry for an account document that was just updated."""
+    entry = make_entry(kind, amount, account["balance"])
+    if entry_id is not None:
+        entry["_id"] = entry_id
+    entry["account_id"] = account["_id"]
+    entry["owner_id"] = account["owner_id"]
+    await record_entries([entry], session=session)
+    return entry
+
+
+async def record_entries(entries, session=None):
+    """Append already-built entries (each carrying account_id/owner_id) in one write.
+
+    The daily rollups are updated in the same transaction, joining the
+    caller's when there is one, so they never drift from the ledger.
+    """
+    if not entries:
+        return
+
+    async def _write(session):
+        await transactions_collection.insert_many(entries, ordered=False, session=session)
+        await apply_entries(entries, session=session)
+
+    await run_in_transaction(_write, session)
+
+
+def encode_cursor(entry):
+    raw = f"{entry['timestamp'].isoformat()}|{entry['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(entry_id)
+    except (ValueError, InvalidId):
+        raise ValueError("Invalid pagination cursor")
+
+
+def _keyset(cursor, op):
+    timestamp, entry_id = decode_cursor(cursor)
+    return {"$or": [
+        {"timestamp": {op: timestamp}},
+        {"timestamp": timestamp, "_id": {op: entry_id}},
+    ]}
+
+
+def serialize_entry(entry):
+    return {
+        "id": str(entry["_id"]),
+        "timestamp": entry["timestamp"],
+        "type": entry["type"],
+        "amount": entry["amount"],
+        "balance": entry.get("balance"),
+    }
+
+
+async def fetch_page(account_id, limit=DEFAULT_PAGE_SIZE, before=None, after=None, session=None):
+    """Return one page of history, newest first.
+
+    `before` walks towards older entries and `after` towards newer ones; both
+    take a cursor handed out by a previous page.
+    """
+    if before and after:
+        raise ValueError("Use either 'before' or 'after', not both")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    query = {"account_id": account_id}
+    direction = -1
+    if before:
+        query.update(_keyset(before, "$lt"))
+    elif after:
+        query.update(_keyset(after, "$gt"))
+        direction = 1
+
+    # Fetch one extra row to know whether another page exists
+    cursor = transactions_read_collection.find(
+        query,
+        sort=[("timestamp", direction), ("_id", direction)],
+        limit=limit + 1,
+        session=session,
+    )
+    entries = await cursor.to_list(None)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if direction == 1:
+        entries.reverse()
+
+    # Older entries remain if we paged backwards and got a full page, or if
+    # we paged forwards from a cursor (the cursor entry itself is older).
+    more_older = has_more if direction == -1 else bool(entries)
+    more_newer = bool(before) if direction == -1 else has_more
+    return {
+        "transactions": [serialize_entry(e) for e in entries],
+        "before": encode_cursor(entries[-1]) if entries and more_older else None,
+        "after": encode_cursor(entries[0]) if entries and more_newer else None,
+    }
+
+
+async def newest_entry_id(account_id, session=None):
+    """_id of the account's newest ledger entry (covered by account_timestamp), or None."""
+    entry = await transactions_read_collection.find_one(
+        {"account_id": account_id},
+        {"_id": 1},
+        sort=[("timestamp", -1), ("_id", -1)],
+        session=session,
+    )
+    return entry["_id"] if entry else None
+
+
+async def iter_entries(account_id, start=None, end=None, batch_size=1000):
+    """Yield ledger entries oldest first, optionally within [start, end)."""
+    query = {"account_id": account_id}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+    cursor = transactions_read_collection.find(
+        query,
+        {"timestamp": 1, "type": 1, "amount": 1, "balance": 1},
+        sort=[("timestamp", 1), ("_id", 1)],
+        batch_size=batch_size,
+    )
+    async for entry in cursor:
+        yield entry
+
+
+# One-off migration of the old embedded "transactions" arrays
+
+_LEGACY_ENTRY = re.compile(r"^\[(?P<ts>[^\]]+)\] (?P<verb>Deposited|Withdrawn) \$(?P<amount>[0-9.]+)$")
+
+
+async def migrate_embedded_transactions(batch_size=1000):
+    """Move legacy string entries into the ledger and drop the arrays.
+
+    Running balances are then rebuilt and the accounts' daily rollups
+    backfilled; see rebuild_running_balances().
+    """
+    migrated = 0
+    async for account in accounts_collection.find({"transactions": {"$exists": True}}, batch_size=batch_size):
+        entries = []
+        for line in account.get("transactions") or []:
+            match = _LEGACY_ENTRY.match(line) if isinstance(line, str) else None
+            if not match:
+                continue
+            entries.append({
+                "account_id": account["_id"],
+                "owner_id": account["owner_id"],
+                "timestamp": datetime.strptime(match["ts"], "%Y-%m-%d %H:%M:%S"),
+                "type": "deposit" if match["verb"] == "Deposited" else "withdrawal",
+                "amount": float(match["amount"]),
+                "balance": None,  # running balance was never recorded; rebuilt below
+            })
+        migrated += await run_in_transaction(_migrate_account(account["_id"], entries))
+    await rebuild_running_balances()
+    return migrated
+
+
+def _migrate_account(account_id, entries):
+    # Dropping the array and inserting its entries commit together, so an
+    # interrupted run cannot leave entries that a rerun would insert again
+    async def _write(session):
+        result = await accounts_collection.update_one(
+            {"_id": account_id, "transactions": {"$exists": True}},
+            {"$unset": {"transactions": ""}},
+            session=session,
+        )
+        if result.modified_count == 0:
+            return 0  # migrated concurrently
+        if entries:
+            await transactions_collection.insert_many(entries, ordered=False, session=session)
+        return len(entries)
+
+    return _write
+
+
+async def rebuild_running_balances():
+    """Fill in missing running balances, then backfill the accounts' rollups.
+
+    Each account's ledger is walked newest first from its current balance.
+    The balance before an entry is the balance after it minus its effect, so
+    every missing balance follows from the entry after it. Recorded balances
+    are trusted and re-anchor the walk. Rollups skip entries without a
+    balance, so the affected accounts are backfilled afterwards. Also picks
+    up entries left by earlier runs of the migration.
+    """
+    rebuilt = 0
+    for account_id in await transactions_collection.distinct("account_id", {"balance": None}):
+        rebuilt += await run_in_transaction(_rebuild_account(account_id))
+        await backfill(account_id)
+    return rebuilt
+
+
+def _rebuild_account(account_id):
+    # One transaction reads the balance and the ledger from the same
+    # snapshot, so concurrent writes cannot skew the walk
+    async def _write(session):
+        account = await accounts_collection.find_one({"_id": account_id}, {"balance": 1}, session=session)
+        if account is None:
+            return 0
+        running = account["balance"]
+        updates = []
+        cursor = transactions_collection.find(
+            {"account_id": account_id},
+            {"type": 1, "amount": 1, "balance": 1},
+            sort=[("timestamp", -1), ("_id", -1)],
+            session=session,
+        )
+        async for entry in cursor:
+            if entry.get("balance") is None:
+                updates.append(UpdateOne({"_id": entry["_id"], "balance": None}, {"$set": {"balance": running}}))
+            else:
+                running = entry["balance"]
+            running -= entry["amount"] if entry["type"] in CREDIT_TYPES else -entry["amount"]
+        if updates:
+            await transactions_collection.bulk_write(updates, ordered=False, session=session)
+        return len(updates)
+
+    return _write
+
+
+async def _main():
+    try:
+        print(f"Migrated {await migrate_embedded_transactions()} ledger entries")
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,5 +1,12 @@
+import math
 from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from app.core.database import accounts_collection, accounts_read_collection, run_in_transaction
 from app.accounts.models import SavingsAccount, CurrentAccount, FixedDepositAccount
+from app.accounts.ledger import record_entry
 
 def create_account(account_type, name, initial_balance, maturity_days=30):
     # Normalize type
@@ -14,3 +21,246 @@ def create_account(account_type, name, initial_balance, maturity_days=30):
         return FixedDepositAccount(name, initial_balance, maturity)
     else:
         raise ValueError("Invalid account type")
+
+
+ACCOUNT_CLASSES = {
+    "savings": SavingsAccount,
+    "current": CurrentAccount,
+    "fixed": FixedDepositAccount,
+}
+
+
+def build_account(doc):
+    """Model object for a stored account document, for in-process rule checks."""
+    cls = ACCOUNT_CLASSES.get(doc["account_type"])
+    if cls is None:
+        raise ValueError("Invalid account type")
+    if cls is FixedDepositAccount:
+        return cls.from_state(doc["owner_id"], doc["balance"], maturity_date=doc["maturity_date"])
+    return cls.from_state(doc["owner_id"], doc["balance"])
+
+
+def new_account_document(account_type, owner_id, initial_deposit):
+    """Apply the opening rules for `account_type` and return the document to insert."""
+    if not math.isfinite(initial_deposit):
+        raise ValueError("Initial deposit must be a finite amount")
+    account_type = account_type.lower()
+    if account_type == "savings":
+        account = SavingsAccount(owner=owner_id, balance=initial_deposit)
+    elif account_type == "current":
+        account = CurrentAccount(owner=owner_id, balance=initial_deposit)
+    elif account_type == "fixed":
+        account = FixedDepositAccount(owner=owner_id, balance=initial_deposit, duration_months=6)
+    else:
+        raise ValueError("Invalid account type")
+
+    return {
+        "owner_id": owner_id,
+        "account_type": account_type,
+        "balance": account.balance,
+        "version": 0,  # bumped by every balance change; used as the ETag
+        "maturity_date": getattr(account, "maturity_date", None),
+        "created_at": datetime.now(),
+    }
+
+
+# Money movement
+#
+# Each operation is a single conditional find_one_and_update: the account
+# rules are expressed as a filter so Mongo only applies the $inc when the
+# guard still holds. Concurrent requests can no longer overwrite each other's
+# balance. The $inc and the matching ledger entry commit in one transaction,
+# so the balance never moves without its ledger row.
+#
+# That atomicity has a cost. A deposit is now four round trips: the
+# findAndModify (which also starts the transaction), the ledger insert, the
+# daily rollup upsert and commitTransaction. The single $inc+$push update
+# this replaced was one round trip, and the original read-then-write was
+# two. Hot accounts can batch that cost away (see coalescing.py). Measure
+# with benchmarks/load.py.
+
+DEPOSITABLE_TYPES = ["savings", "current"]
+
+
+def is_valid_amount(amount):
+    # NaN and inf slip past `amount <= 0`, and a NaN $inc would poison the
+    # stored balance for good
+    return math.isfinite(amount) and amount > 0
+
+
+def withdrawal_guard(amount, now=None):
+    """Filter matching accounts that may give up `amount` right now."""
+    now = now or datetime.now()
+    return {"$or": [
+        {"account_type": "savings", "balance": {"$gte": SavingsAccount.MIN_BALANCE + amount}},
+        {"account_type": "current", "balance": {"$gte": CurrentAccount.OVERDRAFT_LIMIT + amount}},
+        {"account_type": "fixed", "balance": {"$gte": amount}, "maturity_date": {"$lte": now}},
+    ]}
+
+
+def owned_account_filter(account_id, owner_id):
+    """Filter matching `account_id` only when it belongs to `owner_id`."""
+    try:
+        return {"_id": ObjectId(account_id), "owner_id": owner_id}
+    except (InvalidId, TypeError):
+        raise LookupError("Account not found")
+
+
+def balance_update(delta, last_entry_id=None, **extra):
+    """Update bumping balance and version, and noting the newest ledger entry.
+
+    last_entry_id lets history polls be answered from the account document
+    (see routes.py) without querying the ledger.
+    """
+    update = {"$inc": {"balance": delta, "version": 1}}
+    fields = dict(extra)
+    if last_entry_id is not None:
+        fields["last_entry_id"] = last_entry_id
+    if fields:
+        update["$set"] = fields
+    return update
+
+
+async def apply_balance_change(account_filter, guard, delta, last_entry_id=None, session=None):
+    """$inc the balance by `delta` if `guard` holds; returns the updated document or None."""
+    return await accounts_collection.find_one_and_update(
+        {**account_filter, **guard},
+        balance_update(delta, last_entry_id),
+        projection={"transactions": 0},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+
+
+async def explain_failure(account_filter, amount, withdrawing, session=None):
+    """Raise the LookupError/ValueError explaining why a guarded update matched nothing."""
+    # Only reached when the conditional update matched nothing, so the extra
+    # read stays off the happy path.
+    account = await accounts_collection.find_one(account_filter, {"transactions": 0}, session=session)
+    if not account:
+        raise LookupError("Account not found")
+
+    account_type = account["account_type"]
+    if not withdrawing:
+        if account_type == "fixed":
+            raise ValueError("Cannot deposit into fixed deposit account after creation")
+        raise ValueError("Unsupported account type for deposit")
+
+    if account_type == "savings":
+        raise ValueError("Cannot withdraw: balance would drop below $100 minimum")
+    if account_type == "current":
+        raise ValueError("Overdraft limit exceeded")
+    if account_type == "fixed":
+        if datetime.now() < account["maturity_date"]:
+            raise ValueError("Cannot withdraw before maturity date")
+        raise ValueError("Insufficient funds")
+    raise ValueError("Invalid account type")
+
+
+async def deposit_to_account(account_id, owner_id, amount, session=None):
+    """Credit an account atomically. Returns the updated account document."""
+    if not is_valid_amount(amount):
+        raise ValueError("Deposit amount must be positive")
+    account_filter = owned_account_filter(account_id, owner_id)
+
+    async def _deposit(session):
+        entry_id = ObjectId()
+        updated = await apply_balance_change(
+            account_filter,
+            {"account_type": {"$in": DEPOSITABLE_TYPES}},
+            amount,
+            last_entry_id=entry_id,
+            session=session,
+        )
+        if updated is None:
+            await explain_failure(account_filter, amount, withdrawing=False, session=session)
+        await record_entry(updated, "deposit", amount, entry_id=entry_id, session=session)
+        return updated
+
+    return await run_in_transaction(_deposit, session)
+
+
+async def withdraw_from_account(account_id, owner_id, amount, session=None):
+    """Debit an account atomically. Returns the updated account document."""
+    if not is_valid_amount(amount):
+        raise ValueError("Withdrawal amount must be positive")
+    account_filter = owned_account_filter(account_id, owner_id)
+
+    async def _withdraw(session):
+        entry_id = ObjectId()
+        updated = await apply_balance_change(
+            account_filter,
+            withdrawal_guard(amount),
+            -amount,
+            last_entry_id=entry_id,
+            session=session,
+        )
+        if updated is None:
+            await explain_failure(account_filter, amount, withdrawing=True, session=session)
+        await record_entry(updated, "withdrawal", amount, entry_id=entry_id, session=session)
+        return updated
+
+    return await run_in_transaction(_withdraw, session)
+
+
+async def transfer_between_accounts(owner_id, from_account_id, to_account_id, amount, session=None):
+    """Move money between two of the owner's accounts in one Mongo transaction.
+
+    Both legs use the same guarded updates as deposit/withdraw, so the
+    savings minimum, overdraft limit and fixed-deposit rules all apply.
+    with_transaction retries the whole callback on TransientTransactionError
+    and retries the commit on UnknownTransactionCommitResult. Needs a
+    replica set (a single-node one is enough locally).
+    """
+    if not is_valid_amount(amount):
+        raise ValueError("Transfer amount must be positive")
+    if str(from_account_id) == str(to_account_id):
+        raise ValueError("Cannot transfer to the same account")
+
+    async def _transfer(session):
+        debited = await withdraw_from_account(from_account_id, owner_id, amount, session=session)
+        credited = await deposit_to_account(to_account_id, owner_id, amount, session=session)
+        return debited, credited
+
+    return await run_in_transaction(_transfer, session)
+
+
+async def account_overview(owner_id, session=None):
+    """All of an owner's accounts plus totals, in a single aggregation.
+
+    $match + $sort are served by the owner_created index, and the totals are
+    computed by Mongo in the same round trip via $facet.
+    """
+    pipeline = [
+        {"$match": {"owner_id": owner_id}},
+        {"$sort": {"created_at": 1}},
+        {"$facet": {
+            "accounts": [
+                {"$project": {"account_type": 1, "balance": 1, "maturity_date": 1, "created_at": 1}},
+            ],
+            "totals": [
+                {"$group": {"_id": None, "total_balance": {"$sum": "$balance"}, "account_count": {"$sum": 1}}},
+            ],
+            "by_type": [
+                {"$group": {"_id": "$account_type", "balance": {"$sum": "$balance"}, "count": {"$sum": 1}}},
+            ],
+        }},
+    ]
+    cursor = await accounts_read_collection.aggregate(pipeline, session=session)
+    result = (await cursor.to_list(1))[0]
+    totals = result["totals"][0] if result["totals"] else {"total_balance": 0.0, "account_count": 0}
+    return {
+        "accounts": [
+            {
+                "account_id": str(doc["_id"]),
+                "account_type": doc["account_type"],
+                "balance": doc["balance"],
+                "maturity_date": doc.get("maturity_date"),
+                "created_at": doc.get("created_at"),
+            }
+            for doc in result["accounts"]
+        ],
+        "total_balance": totals["total_balance"],
+        "account_count": totals["account_count"],
+        "balance_by_type": {group["_id"]: group["balance"] for group in result["by_type"]},
+    }
@@ -1,5 +1,17 @@
+import math
 from datetime import datetime, timedelta
 
+
+def make_entry(kind, amount, balance, when=None):
+    """Structured ledger entry, shaped like schema.TransactionEntry."""
+    return {
+        "timestamp": when or datetime.now(),
+        "type": kind,
+        "amount": amount,
+        "balance": balance,
+    }
+
+
 class BankAccount:
     def __init__(self, owner, balance=0.0):
         self.owner = owner
@@ -7,26 +19,34 @@ class BankAccount:
         self.transactions = []
 
     def deposit(self, amount):
-        if amount <= 0:
+        if not math.isfinite(amount) or amount <= 0:
             raise ValueError("Deposit amount must be positive")
         self.balance += amount
-        self.transactions.append(
-            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Deposited ${amount}"
-        )
+        self.transactions.append(make_entry("deposit", amount, self.balance))
 
     def withdraw(self, amount):
-        if amount <= 0:
+        if not math.isfinite(amount) or amount <= 0:
             raise ValueError("Withdrawal amount must be positive")
         if amount > self.balance:
             raise ValueError("Insufficient funds")
+        self._debit(amount)
+
+    def _debit(self, amount):
         self.balance -= amount
-        self.transactions.append(
-            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Withdrawn ${amount}"
-        )
+        self.transactions.append(make_entry("withdrawal", amount, self.balance))
 
     def get_balance(self):
         return self.balance
 
+    @classmethod
+    def from_state(cls, owner, balance, **attrs):
+        """Rehydrate a stored account without re-running the opening rules."""
+        account = cls.__new__(cls)
+        BankAccount.__init__(account, owner, balance)
+        for name, value in attrs.items():
+            setattr(account, name, value)
+        return account
+
     def get_transaction_history(self):
         return self.transactions
 
@@ -49,9 +69,12 @@ class CurrentAccount(BankAccount):
     OVERDRAFT_LIMIT = -500
 
     def withdraw(self, amount):
+        if not math.isfinite(amount) or amount <= 0:
+            raise ValueError("Withdrawal amount must be positive")
         if self.balance - amount < self.OVERDRAFT_LIMIT:
             raise ValueError("Overdraft limit exceeded")
-        super().withdraw(amount)
+        # Overdraft is allowed, so skip the base "Insufficient funds" check
+        self._debit(amount)
 
 
 class FixedDepositAccount(BankAccount):
@@ -0,0 +1,197 @@
+# app/accounts/rollups.py
+#
+# Materialised per-account, per-day balance rollups.
+#
+# Every ledger write also folds its entries into daily_balances, in the
+# same transaction as the ledger insert. The fields are the day's opening
+# and closing balance plus deposit, withdrawal and interest counts and
+# totals. The upsert is one aggregation-pipeline update
+# that keeps the earliest opening and latest closing, so concurrent or
+# out-of-order writes still converge. Long-range statements and analytics
+# then read one row per day instead of every transaction.
+#
+#   python -m app.accounts.rollups [--account ACCOUNT_ID]   # backfill from the ledger
+
+import argparse
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.core.database import (
+    rollups_collection,
+    rollups_read_collection,
+    transactions_collection,
+    close_client,
+)
+
+CREDIT_TYPES = ("deposit", "interest")
+
+
+def day_of(timestamp):
+    return datetime.combine(timestamp.date(), datetime.min.time())
+
+
+def _signed(entry):
+    return entry["amount"] if entry["type"] in CREDIT_TYPES else -entry["amount"]
+
+
+def _fold(entries):
+    """Collapse entries into one summary per (account_id, day)."""
+    summaries = OrderedDict()
+    for entry in sorted(entries, key=lambda e: e["timestamp"]):
+        if entry.get("balance") is None:
+            continue  # migrated history without running balances
+        key = (entry["account_id"], day_of(entry["timestamp"]))
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = {
+                "first_at": entry["timestamp"],
+                "opening": entry["balance"] - _signed(entry),
+                "deposit_count": 0, "deposit_total": 0.0,
+                "withdrawal_count": 0, "withdrawal_total": 0.0,
+                "interest_count": 0, "interest_total": 0.0,
+            }
+        summary["last_at"] = entry["timestamp"]
+        summary["closing"] = entry["balance"]
+        summary[f"{entry['type']}_count"] += 1
+        summary[f"{entry['type']}_total"] += entry["amount"]
+    return summaries
+
+
+def _missing(field):
+    return {"$eq": [{"$type": f"${field}"}, "missing"]}
+
+
+def _rollup_update(summary):
+    counters = {
+        field: {"$add": [{"$ifNull": [f"${field}", 0]}, summary[field]]}
+        for field in ("deposit_count", "deposit_total", "withdrawal_count", "withdrawal_total",
+                      "interest_count", "interest_total")
+    }
+    return [{"$set": {
+        # Within one $set every "$field" is the value before this update
+        "opening": {"$cond": [
+            {"$or": [_missing("first_at"), {"$lt": [summary["first_at"], "$first_at"]}]},
+            summary["opening"], "$opening",
+        ]},
+        "closing": {"$cond": [
+            {"$or": [_missing("last_at"), {"$gte": [summary["last_at"], "$last_at"]}]},
+            summary["closing"], "$closing",
+        ]},
+        "first_at": {"$min": ["$first_at", summary["first_at"]]},
+        "last_at": {"$max": ["$last_at", summary["last_at"]]},
+        **counters,
+    }}]
+
+
+async def apply_entries(entries, session=None):
+    """Fold freshly written ledger entries into their daily rollups."""
+    updates = [
+        UpdateOne({"account_id": account_id, "day": day}, _rollup_update(summary), upsert=True)
+        for (account_id, day), summary in _fold(entries).items()
+    ]
+    if updates:
+        await rollups_collection.bulk_write(updates, ordered=False, session=session)
+
+
+async def daily_balances(account_id, start, end, session=None):
+    """One row per calendar day in [start, end], carrying balances over quiet days."""
+    start, end = day_of(start), day_of(end)
+    # The closing balance before the range is the opening for quiet leading days
+    previous = await rollups_read_collection.find_one(
+        {"account_id": account_id, "day": {"$lt": start}}, {"closing": 1}, sort=[("day", -1)], session=session
+    )
+    carry = previous["closing"] if previous else None
+    rows = {
+        row["day"]: row
+        async for row in rollups_read_collection.find(
+            {"account_id": account_id, "day": {"$gte": start, "$lte": end}}, {"_id": 0}, session=session
+        )
+    }
+
+    days = []
+    day = start
+    while day <= end:
+        row = rows.get(day)
+        if row:
+            carry = row["closing"]
+            days.append({
+                "day": day.date(),
+                "opening": row["opening"],
+                "closing": row["closing"],
+                "deposit_count": row.get("deposit_count", 0),
+                "deposit_total": row.get("deposit_total", 0.0),
+                "withdrawal_count": row.get("withdrawal_count", 0),
+                "withdrawal_total": row.get("withdrawal_total", 0.0),
+            })
+        elif carry is not None:
+            days.append({"day": day.date(), "opening": carry, "closing": carry,
+                         "deposit_count": 0, "deposit_total": 0.0,
+                         "withdrawal_count": 0, "withdrawal_total": 0.0})
+        day += timedelta(days=1)
+
+    closings = [d["closing"] for d in days]
+    return {
+        "days": days,
+        "average_balance": sum(closings) / len(closings) if closings else None,
+        "min_balance": min(closings) if closings else None,
+        "max_balance": max(closings) if closings else None,
+    }
+
+
+async def backfill(account_id=None):
+    """Rebuild rollups from the ledger with a server-side $group + $merge."""
+    match = {"balance": {"$ne": None}}
+    if account_id is not None:
+        match["account_id"] = account_id
+
+    def count(kind):
+        return {"$sum": {"$cond": [{"$eq": ["$type", kind]}, 1, 0]}}
+
+    def total(kind):
+        return {"$sum": {"$cond": [{"$eq": ["$type", kind]}, "$amount", 0]}}
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"account_id": 1, "timestamp": 1}},
+        {"$group": {
+            "_id": {"account_id": "$account_id", "day": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}}},
+            "first": {"$first": "$$ROOT"},
+            "last": {"$last": "$$ROOT"},
+            **{f"{kind}_count": count(kind) for kind in ("deposit", "withdrawal", "interest")},
+            **{f"{kind}_total": total(kind) for kind in ("deposit", "withdrawal", "interest")},
+        }},
+        {"$project": {
+            "_id": 0,
+            "account_id": "$_id.account_id",
+            "day": "$_id.day",
+            "opening": {"$subtract": ["$first.balance", {"$cond": [
+                {"$in": ["$first.type", list(CREDIT_TYPES)]}, "$first.amount", {"$multiply": ["$first.amount", -1]},
+            ]}]},
+            "closing": "$last.balance",
+            "first_at": "$first.timestamp",
+            "last_at": "$last.timestamp",
+            **{f"{kind}_{stat}": 1 for kind in ("deposit", "withdrawal", "interest") for stat in ("count", "total")},
+        }},
+        {"$merge": {"into": "daily_balances", "on": ["account_id", "day"],
+                    "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    cursor = await transactions_collection.aggregate(pipeline, allowDiskUse=True)
+    await cursor.to_list(None)
+
+
+async def _main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill daily balance rollups from the ledger")
+    parser.add_argument("--account", type=ObjectId, help="only this account id")
+    args = parser.parse_args(argv)
+    try:
+        await backfill(args.account)
+        print("Backfill complete")
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,51 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from datetime import datetime
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime
+from typing import Literal, Optional
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
-from app.core.database import accounts_collection
-from app.accounts.models import SavingsAccount, CurrentAccount, FixedDepositAccount
+from app.core.database import (
+    accounts_collection,
+    accounts_read_collection,
+    start_causal_session,
+    format_operation_time,
+    parse_operation_time,
+)
+from app.accounts.logic import (
+    deposit_to_account,
+    withdraw_from_account,
+    transfer_between_accounts,
+    account_overview,
+    new_account_document,
+)
+from app.accounts.ledger import fetch_page, newest_entry_id, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.accounts.batch import apply_batch
+from app.accounts.coalescing import deposit_coalescer, is_coalesced
+from app.accounts.statement import stream_statement, MEDIA_TYPES
+from app.accounts.cache import balance_cache, make_etag, etag_matches
+from app.accounts.events import event_hub, format_sse
+from app.accounts.rollups import daily_balances
+from app.core.config import EVENT_KEEPALIVE_SECONDS
+from app.core.serialization import render
+from app.accounts.schema import (
+    TransactionPage,
+    BatchRequest,
+    BatchResponse,
+    TransferRequest,
+    TransferResponse,
+    AccountOverview,
+    DailyBalanceReport,
+)
 from app.auth.utils import get_current_user
 
 router = APIRouter(prefix="/accounts", tags=["Accounts"])
 
+OPERATION_TIME_HEADER = "X-Operation-Time"
+# InvalidOptions: how a read reports an afterClusterTime ahead of the
+# cluster's time
+INVALID_OPTIONS = 72
 
-# Create Account
-@router.post("/create")
-def create_account(account_type: str, initial_deposit: float, current_user: dict = Depends(get_current_user)):
-    # Check if user already has this account type
-    existing = accounts_collection.find_one({"owner_id": current_user["_id"], "account_type": account_type})
-    if existing:
-        raise HTTPException(status_code=400, detail=f"You already have a {account_type} account")
 
-    # Create account based on type and rules
-    if account_type.upper() == "SAVINGS":
-        try:
-            account = SavingsAccount(owner=current_user["_id"], balance=initial_deposit)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
+# Sessions for read-your-writes (see app/core/database.py)
+async def write_session():
+    async with start_causal_session() as session:
+        yield session
 
-    elif account_type.lower() == "current":
-        account = CurrentAccount(owner=current_user["_id"], balance=initial_deposit)
 
-    elif account_type.lower() == "fixed":
+async def read_session(x_after_operation_time: Optional[str] = Header(None)):
+    # Without the header, reads go to a secondary with no causal guarantee
+    if not x_after_operation_time:
+        yield None
+        return
+    try:
+        operation_time = parse_operation_time(x_after_operation_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async with start_causal_session() as session:
+        session.advance_operation_time(operation_time)
         try:
-            account = FixedDepositAccount(owner=current_user["_id"], balance=initial_deposit, duration_months=6)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-
-    else:
-        raise HTTPException(status_code=400, detail="Invalid account type")
-
-    # Save to DB
-    account_doc = {
-        "owner_id": current_user["_id"],
-        "account_type": account_type.lower(),
-        "balance": account.balance,
-        "transactions": account.transactions,
-        "maturity_date": getattr(account, "maturity_date", None),
-        "created_at": datetime.now()
-    }
-    result = accounts_collection.insert_one(account_doc)
+            yield session
+        except OperationFailure as e:
+            # Only a value this deployment never issued can be in the future
+            if e.code != INVALID_OPTIONS:
+                raise
+            raise HTTPException(status_code=400, detail="Operation time is ahead of the cluster time")
+
+
+def _operation_time_headers(session):
+    operation_time = format_operation_time(session)
+    return {OPERATION_TIME_HEADER: operation_time} if operation_time else {}
+
+
+def _expose_operation_time(response: Response, session):
+    response.headers.update(_operation_time_headers(session))
+
+
+def _account_oid(account_id: str):
+    # A malformed id cannot name an account the caller owns
+    try:
+        return ObjectId(account_id)
+    except InvalidId:
+        raise HTTPException(status_code=404, detail="Account not found")
+
+
+# Overview of all the caller's accounts
+@router.get("", response_model=AccountOverview)
+async def list_accounts(
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    session=Depends(read_session),
+):
+    return render(request, await account_overview(current_user["_id"], session=session))
+
+
+# Create Account
+@router.post("/create")
+async def create_account(
+    account_type: str,
+    response: Response,
+    initial_deposit: float = Query(..., allow_inf_nan=False),
+    current_user: dict = Depends(get_current_user),
+    session=Depends(write_session),
+):
+    # Create account based on type and rules
+    try:
+        account_doc = new_account_document(account_type, current_user["_id"], initial_deposit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # One account per type per owner is enforced by the owner_type_unique index
+    try:
+        result = await accounts_collection.insert_one(account_doc, session=session)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail=f"You already have a {account_type} account")
+    _expose_operation_time(response, session)
 
     return {
         "message": f"{account_type.capitalize()} account created successfully",
@@ -55,82 +132,284 @@ def create_account(account_type: str, initial_deposit: float, current_user: dict
 
 # Deposit
 @router.post("/{account_id}/deposit")
-def deposit(account_id: str, amount: float, current_user: dict = Depends(get_current_user)):
-    account = accounts_collection.find_one({"_id": ObjectId(account_id), "owner_id": current_user["_id"]})
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
+async def deposit(
+    account_id: str,
+    response: Response,
+    amount: float = Query(..., allow_inf_nan=False),
+    current_user: dict = Depends(get_current_user),
+    session=Depends(write_session),
+):
+    try:
+        # Hot merchant accounts share one write per flush (app/accounts/coalescing.py)
+        # (it updates the balance cache itself)
+        if is_coalesced(account_id):
+            await deposit_coalescer.deposit(account_id, current_user["_id"], amount, session=session)
+        else:
+            _cache_written(await deposit_to_account(account_id, current_user["_id"], amount, session=session))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        # The write may have committed; don't trust the cached state
+        balance_cache.invalidate(account_id)
+        raise
+    _expose_operation_time(response, session)
+    return {"message": "Deposit successful"}
 
-    # Restrict deposits for fixed deposit accounts
-    if account["account_type"] == "fixed":
-        raise HTTPException(status_code=400, detail="Cannot deposit into fixed deposit account after creation")
 
-    # Update using model logic
-    if account["account_type"] == "savings":
-        acc_obj = SavingsAccount(owner=account["owner_id"], balance=account["balance"])
-    elif account["account_type"] == "current":
-        acc_obj = CurrentAccount(owner=account["owner_id"], balance=account["balance"])
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported account type for deposit")
+# Withdraw
+@router.post("/{account_id}/withdraw")
+async def withdraw(
+    account_id: str,
+    response: Response,
+    amount: float = Query(..., allow_inf_nan=False),
+    current_user: dict = Depends(get_current_user),
+    session=Depends(write_session),
+):
+    try:
+        _cache_written(await withdraw_from_account(account_id, current_user["_id"], amount, session=session))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        # The write may have committed; don't trust the cached state
+        balance_cache.invalidate(account_id)
+        raise
+    _expose_operation_time(response, session)
+    return {"message": "Withdrawal successful"}
 
+# Transfer between the caller's own accounts
+@router.post("/transfer", response_model=TransferResponse)
+async def transfer(
+    transfer_request: TransferRequest,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    session=Depends(write_session),
+):
     try:
-        acc_obj.deposit(amount)
+        debited, credited = await transfer_between_accounts(
+            current_user["_id"],
+            transfer_request.from_account_id,
+            transfer_request.to_account_id,
+            transfer_request.amount,
+            session=session,
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        # The write may have committed; don't trust the cached state
+        balance_cache.invalidate(transfer_request.from_account_id, transfer_request.to_account_id)
+        raise
+    _cache_written(debited)
+    _cache_written(credited)
+    _expose_operation_time(response, session)
+    return {
+        "message": "Transfer successful",
+        "from_balance": debited["balance"],
+        "to_balance": credited["balance"],
+    }
 
-    # Save updated balance and transactions
-    accounts_collection.update_one(
-        {"_id": ObjectId(account_id)},
-        {"$set": {"balance": acc_obj.balance, "transactions": acc_obj.transactions}}
+
+# Batch deposits/withdrawals across the caller's accounts
+@router.post("/transactions/batch", response_model=BatchResponse)
+async def batch_transactions(
+    batch: BatchRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    session=Depends(write_session),
+):
+    try:
+        results = await apply_batch(
+            current_user["_id"], [op.model_dump() for op in batch.operations], session=session
+        )
+    finally:
+        balance_cache.invalidate(*{op.account_id for op in batch.operations})
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    return render(
+        request,
+        {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results},
+        headers=_operation_time_headers(session),
     )
-    return {"message": "Deposit successful"}
 
 
-# Withdraw
-@router.post("/{account_id}/withdraw")
-def withdraw(account_id: str, amount: float, current_user: dict = Depends(get_current_user)):
-    account = accounts_collection.find_one({"_id": ObjectId(account_id), "owner_id": current_user["_id"]})
+def _cache_written(account):
+    # Write-through: the updated document is the freshest state there is
+    balance_cache.put(
+        account["_id"], account["owner_id"], account["version"], account["balance"], account.get("last_entry_id")
+    )
+
+
+async def _account_version(account_id: str, owner_id, session=None):
+    """(version, balance, last_entry_id) for an owned account, from the cache when fresh.
+
+    A causal session means the caller asked to see its own write, so the
+    cache is bypassed and the read waits for that operation time.
+    """
+    if session is None:
+        cached = balance_cache.get(account_id)
+        if cached and cached[0] == owner_id:
+            return cached[1:]
+    account = await accounts_read_collection.find_one(
+        {"_id": _account_oid(account_id), "owner_id": owner_id},
+        {"balance": 1, "version": 1, "last_entry_id": 1},
+        session=session,
+    )
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
+    # A lagging secondary can return an older version than one this worker
+    # wrote; put() keeps and returns the newer
+    kept = balance_cache.put(
+        account_id, owner_id, account.get("version", 0), account["balance"], account.get("last_entry_id")
+    )
+    return kept[1:]
+
+
+def _page_etag(account_id, newest_id, has_newer, variant):
+    return make_etag(account_id, f"{newest_id or 0}{'+' if has_newer else ''}", variant=variant)
+
+
+# Get Account Balance
+@router.get("/{account_id}/balance")
+async def get_balance(
+    account_id: str,
+    request: Request,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+    session=Depends(read_session),
+):
+    version, balance, _ = await _account_version(account_id, current_user["_id"], session)
+    etag = make_etag(account_id, version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return render(request, {"balance": balance}, headers={"ETag": etag})
 
-    # Create account object based on type
-    if account["account_type"] == "savings":
-        acc_obj = SavingsAccount(owner=account["owner_id"], balance=account["balance"])
-    elif account["account_type"] == "current":
-        acc_obj = CurrentAccount(owner=account["owner_id"], balance=account["balance"])
-    elif account["account_type"] == "fixed":
-        acc_obj = FixedDepositAccount(owner=account["owner_id"], balance=account["balance"])
-        acc_obj.maturity_date = account["maturity_date"]
-
-        # Check maturity date
-        if datetime.now() < acc_obj.maturity_date:
-            raise HTTPException(status_code=400, detail="Cannot withdraw before maturity date")
-    else:
-        raise HTTPException(status_code=400, detail="Invalid account type")
+# Get Transaction History (cursor paginated, newest first)
+@router.get("/{account_id}/transactions", response_model=TransactionPage)
+async def get_transactions(
+    account_id: str,
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+    session=Depends(read_session),
+):
+    _, _, last_entry_id = await _account_version(account_id, current_user["_id"], session)
+    variant = f"{limit}.{before or ''}.{after or ''}"
 
+    # The ledger is append-only, so the latest page is fully determined by
+    # the account's newest entry. Every balance write records that id on the
+    # account, so the check is usually a cache hit. Accounts untouched since
+    # before last_entry_id existed fall back to one covered index read.
+    if not before and not after:
+        if last_entry_id is None:
+            last_entry_id = await newest_entry_id(_account_oid(account_id), session)
+        etag = _page_etag(account_id, last_entry_id, False, variant)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
     try:
-        acc_obj.withdraw(amount)
+        page = await fetch_page(_account_oid(account_id), limit=limit, before=before, after=after, session=session)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # Save updated balance and transactions
-    accounts_collection.update_one(
-        {"_id": ObjectId(account_id)},
-        {"$set": {"balance": acc_obj.balance, "transactions": acc_obj.transactions}}
+    # Tag the page by what it actually contains. The read may have hit a
+    # different member than the check above, and an older page must never
+    # carry a newer tag.
+    newest = page["transactions"][0]["id"] if page["transactions"] else None
+    etag = _page_etag(account_id, newest, page["after"] is not None, variant)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return render(request, page, headers={"ETag": etag})
+
+
+# Stream a statement (NDJSON or CSV) for a date range
+@router.get("/{account_id}/statement")
+async def get_statement(
+    account_id: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="'start' must be before 'end'")
+    account = await accounts_read_collection.find_one(
+        {"_id": _account_oid(account_id), "owner_id": current_user["_id"]}, {"_id": 1}
     )
-    return {"message": "Withdrawal successful"}
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
 
-# Get Account Balance
-@router.get("/{account_id}/balance")
-def get_balance(account_id: str, current_user: dict = Depends(get_current_user)):
-    account = accounts_collection.find_one({"_id": ObjectId(account_id), "owner_id": current_user["_id"]})
+    filename = f"statement-{account_id}.{format}"
+    return StreamingResponse(
+        stream_statement(account["_id"], format, start, end),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+MAX_ROLLUP_DAYS = 3660
+
+
+# Daily balances over a date range, from the materialised rollups
+@router.get("/{account_id}/balances/daily", response_model=DailyBalanceReport)
+async def get_daily_balances(
+    account_id: str,
+    request: Request,
+    start: date,
+    end: date,
+    current_user: dict = Depends(get_current_user),
+    session=Depends(read_session),
+):
+    if start > end:
+        raise HTTPException(status_code=400, detail="'start' must not be after 'end'")
+    if (end - start).days >= MAX_ROLLUP_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_ROLLUP_DAYS} days")
+    account = await accounts_read_collection.find_one(
+        {"_id": _account_oid(account_id), "owner_id": current_user["_id"]}, {"_id": 1}, session=session
+    )
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
-    return {"balance": account["balance"]}
+    report = await daily_balances(
+        account["_id"], datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time()),
+        session=session,
+    )
+    return render(request, report)
+
 
-# Get Transaction History
-@router.get("/{account_id}/transactions")
-def get_transactions(account_id: str, current_user: dict = Depends(get_current_user)):
-    account = accounts_collection.find_one({"_id": ObjectId(account_id), "owner_id": current_user["_id"]})
+# Live balance and ledger events (Server-Sent Events)
+@router.get("/{account_id}/events")
+async def stream_events(
+    account_id: str,
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user),
+):
+    account = await accounts_read_collection.find_one(
+        {"_id": _account_oid(account_id), "owner_id": current_user["_id"]}, {"_id": 1}
+    )
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
-    return {"transactions": account["transactions"]}
+
+    async def events():
+        queue = event_hub.subscribe(account_id, last_event_id)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event_id, name, payload = await asyncio.wait_for(queue.get(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event_id, name, payload)
+        finally:
+            event_hub.unsubscribe(account_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import List, Literal
-from datetime import datetime
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime
 
 
 class AccountCreate(BaseModel):
@@ -18,11 +18,87 @@ class AccountResponse(BaseModel):
 
 
 class TransactionEntry(BaseModel):
+    id: Optional[str] = None
     timestamp: datetime
-    type: Literal["deposit", "withdrawal"]
+    type: Literal["deposit", "withdrawal", "interest"]
     amount: float
+    balance: Optional[float] = None  # running balance after this entry
 
 
 class TransactionHistoryResponse(BaseModel):
     account_number: str
     history: List[TransactionEntry]
+
+
+class TransactionPage(BaseModel):
+    transactions: List[TransactionEntry]
+    before: Optional[str] = None  # cursor for the next (older) page
+    after: Optional[str] = None   # cursor for the previous (newer) page
+
+
+class BatchOperation(BaseModel):
+    account_id: str
+    type: Literal["deposit", "withdraw"]
+    amount: float = Field(..., allow_inf_nan=False)
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=1000)
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    account_id: str
+    status: Literal["ok", "failed"]
+    error: Optional[str] = None
+    balance: Optional[float] = None
+
+
+class BatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BatchItemResult]
+
+
+class TransferRequest(BaseModel):
+    from_account_id: str
+    to_account_id: str
+    amount: float = Field(..., gt=0, allow_inf_nan=False, example=100.0)
+
+
+class TransferResponse(BaseModel):
+    message: str
+    from_balance: float
+    to_balance: float
+
+
+class AccountSummary(BaseModel):
+    account_id: str
+    account_type: str
+    balance: float
+    maturity_date: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+
+class AccountOverview(BaseModel):
+    accounts: List[AccountSummary]
+    total_balance: float
+    account_count: int
+    balance_by_type: Dict[str, float]
+
+
+class DailyBalance(BaseModel):
+    day: date
+    opening: float
+    closing: float
+    deposit_count: int
+    deposit_total: float
+    withdrawal_count: int
+    withdrawal_total: float
+
+
+class DailyBalanceReport(BaseModel):
+    days: List[DailyBalance]
+    average_balance: Optional[float] = None
+    min_balance: Optional[float] = None
+    max_balance: Optional[float] = None
@@ -0,0 +1,54 @@
+# app/accounts/statement.py
+#
+# Statement export. Entries are streamed straight from the ledger cursor and
+# encoded one row at a time, so memory stays flat regardless of how much
+# history is being exported.
+
+import csv
+import io
+import json
+
+from app.accounts.ledger import iter_entries
+
+STATEMENT_FIELDS = ["timestamp", "type", "amount", "balance"]
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _row(entry):
+    return {
+        "timestamp": entry["timestamp"].isoformat(),
+        "type": entry["type"],
+        "amount": entry["amount"],
+        "balance": entry.get("balance"),
+    }
+
+
+async def ndjson_statement(account_id, start=None, end=None):
+    async for entry in iter_entries(account_id, start, end):
+        yield json.dumps(_row(entry)) + "\n"
+
+
+async def csv_statement(account_id, start=None, end=None):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=STATEMENT_FIELDS)
+
+    def drain():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writeheader()
+    yield drain()
+    async for entry in iter_entries(account_id, start, end):
+        writer.writerow(_row(entry))
+        yield drain()
+
+
+def stream_statement(account_id, fmt, start=None, end=None):
+    if fmt == "csv":
+        return csv_statement(account_id, start, end)
+    return ndjson_statement(account_id, start, end)
@@ -0,0 +1,50 @@
+# app/auth/cache.py
+import time
+from collections import OrderedDict
+
+
+class PrincipalCache:
+    """Bounded LRU of authenticated user documents, keyed by token subject.
+
+    Entries never outlive the token that loaded them, so a cached principal
+    cannot be served after the token's `exp`.
+    """
+
+    def __init__(self, maxsize=10_000, ttl_seconds=60.0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # subject -> (expires_at, user)
+
+    def get(self, subject):
+        entry = self._entries.get(subject)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at <= time.time():
+            del self._entries[subject]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(subject)
+        self.hits += 1
+        return user
+
+    def put(self, subject, user, token_exp=None):
+        expires_at = time.time() + self.ttl_seconds
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        self._entries[subject] = (expires_at, user)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, subject):
+        self._entries.pop(subject, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -2,7 +2,7 @@
 
 from app.auth.schemas import UserCreate, UserInDB
 from app.core.database import db
-from app.auth.utils import get_password_hash, verify_password
+from app.auth.utils import hash_password_async, verify_password_async
 
 async def create_user(user: UserCreate):
     # Check if email is already registered
@@ -10,7 +10,7 @@ async def create_user(user: UserCreate):
     if existing_user:
         raise ValueError("A user with this email already exists")
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password_async(user.password)
 
     user_data = {
         "username": user.username,  # can be non-unique
@@ -33,7 +33,7 @@ async def authenticate_user(email: str, password: str):
     if not user:
         return None
 
-    if not verify_password(password, user["hashed_password"]):
+    if not await verify_password_async(password, user["hashed_password"]):
         return None
 
     return UserInDB(
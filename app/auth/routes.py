@@ -3,27 +3,33 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from bson import ObjectId
 
 from app.auth.schemas import LoginRequest, TokenResponse, UserCreate, UserResponse
-from app.auth.utils import hash_password, verify_password, create_access_token, get_current_token_data
+from app.auth.utils import (
+    hash_password_async,
+    verify_and_update_async,
+    create_access_token,
+    get_current_user,
+    invalidate_principal,
+)
 from app.core.database import users_collection  # direct collection import
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate):
-    existing_user = users_collection.find_one({"email": user.email})
+async def register(user: UserCreate):
+    existing_user = await users_collection.find_one({"email": user.email})
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="Email already registered"
         )
 
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
     user_dict = {
         "username": user.username,
         "email": user.email,
         "password": hashed_pw
     }
-    result = users_collection.insert_one(user_dict)
+    result = await users_collection.insert_one(user_dict)
 
     return UserResponse(
         id=str(result.inserted_id),
@@ -32,26 +38,34 @@ def register(user: UserCreate):
     )
 
 @router.post("/login", response_model=TokenResponse)
-def login(login_data: LoginRequest):
-    user = users_collection.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["password"]):
+async def login(login_data: LoginRequest):
+    user = await users_collection.find_one({"email": login_data.email})
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, 
+            detail="Invalid credentials"
+        )
+    valid, new_hash = await verify_and_update_async(login_data.password, user["password"])
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Invalid credentials"
         )
 
+    # Stored hash uses an old cost factor; upgrade it while we have the plaintext
+    if new_hash:
+        await users_collection.update_one(
+            {"_id": user["_id"], "password": user["password"]},
+            {"$set": {"password": new_hash}},
+        )
+        invalidate_principal(user["_id"])
+
     token = create_access_token(data={"sub": str(user["_id"]), "email": user["email"]})
     return TokenResponse(access_token=token)
 
 @router.get("/me", response_model=UserResponse)
-def get_me(token_data = Depends(get_current_token_data)):
-    user = users_collection.find_one({"email": token_data.email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, 
-            detail="User not found"
-        )
-
+async def get_me(user: dict = Depends(get_current_user)):
+    # Served from the principal cache; no extra lookup by email
     return UserResponse(
         id=str(user["_id"]),
         username=user["username"],
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from typing import Optional
 
 class UserCreate(BaseModel):
@@ -23,9 +23,8 @@ class TokenData(BaseModel):
     email: Optional[str] = None
 
 class UserResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     username: str
     email: EmailStr
-
-    class Config:
-        orm_mode = True
@@ -1,83 +1,84 @@
 # app/auth/utils.py
-from passlib.context import CryptContext
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.core.config import JWT_SECRET_KEY, JWT_ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.config import (
+    JWT_SECRET_KEY,
+    JWT_ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    PRINCIPAL_CACHE_SIZE,
+    PRINCIPAL_CACHE_TTL_SECONDS,
+)
+from app.auth.cache import PrincipalCache
+from app.auth.passwords import (  # re-exported for existing callers
+    pwd_context,
+    hash_password,
+    verify_password,
+    hash_password_async,
+    verify_password_async,
+    verify_and_update_async,
+)
 from app.auth.schemas import TokenData
 from app.core.database import users_collection 
 from bson import ObjectId
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS)
 
 # Use HTTPBearer instead of OAuth2PasswordBearer so Swagger only asks for token
 bearer_scheme = HTTPBearer()
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
-def get_current_token_data(
-    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
-) -> TokenData:
-    token = credentials.credentials
-    credentials_exception = HTTPException(
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
+        detail=detail,
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        username: str | None = payload.get("sub")
-        email: str | None = payload.get("email")
-        if username is None or email is None:
-            raise credentials_exception
-        return TokenData(username=username, email=email)
-    except JWTError:
-        raise credentials_exception
-    
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
-    token = credentials.credentials
 
+async def _resolve_principal(token: str) -> tuple[dict, dict]:
+    """Decode the token and return (payload, user), going to Mongo only on a cache miss."""
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
     except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("Invalid authentication token")
+
+    user_id: str | None = payload.get("sub")
+    if user_id is None:
+        raise _unauthorized("Could not validate credentials")
+
+    user = principal_cache.get(user_id)
+    if user is not None:
+        return payload, user
 
     try:
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
     except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid user ID format",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("Invalid user ID format")
 
     if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("User not found")
+
+    principal_cache.put(user_id, user, token_exp=payload.get("exp"))
+    return payload, user
+
+def invalidate_principal(user_id) -> None:
+    """Drop a cached principal; call after updating or deleting a user."""
+    principal_cache.invalidate(str(user_id))
+
+async def get_current_token_data(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)
+) -> TokenData:
+    payload, user = await _resolve_principal(credentials.credentials)
+    if payload.get("email") is None:
+        raise _unauthorized("Could not validate credentials")
+    return TokenData(user_id=str(user["_id"]), username=user["username"], email=user["email"])
 
-    return user
\ No newline at end of file
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+    _, user = await _resolve_principal(credentials.credentials)
+    return user
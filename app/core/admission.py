@@ -0,0 +1,152 @@
+# app/core/admission.py
+#
+# In-process admission control in front of the expensive route groups.
+#
+# Each caller (the verified token subject, or the client IP when there is no
+# valid token) gets a token bucket per route group. Each group also has a
+# per-worker concurrency cap. Requests over either limit are rejected before
+# any handler, dependency or threadpool work: 429 when the caller is over
+# its rate, 503 when the group is saturated. Both carry Retry-After.
+
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from jose import JWTError, jwt
+
+from app.core.config import (
+    JWT_SECRET_KEY,
+    JWT_ALGORITHM,
+    ADMISSION_MAX_TRACKED_KEYS,
+    AUTH_RATE_PER_SECOND,
+    AUTH_BURST,
+    AUTH_MAX_CONCURRENCY,
+    ACCOUNTS_RATE_PER_SECOND,
+    ACCOUNTS_BURST,
+    ACCOUNTS_MAX_CONCURRENCY,
+)
+from app.core import metrics
+
+
+@dataclass
+class RouteGroup:
+    name: str
+    prefix: str
+    rate: float
+    burst: int
+    max_concurrency: int
+    in_flight: int = 0
+
+
+# Long-lived streams would pin concurrency slots for their whole lifetime;
+# they are still rate limited on connect
+UNCAPPED_SUFFIXES = ("/events",)
+
+ROUTE_GROUPS = [
+    RouteGroup("auth", "/auth", AUTH_RATE_PER_SECOND, AUTH_BURST, AUTH_MAX_CONCURRENCY),
+    RouteGroup("accounts", "/accounts", ACCOUNTS_RATE_PER_SECOND, ACCOUNTS_BURST, ACCOUNTS_MAX_CONCURRENCY),
+]
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Consume one token; return 0 on success or seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+admission_decisions = metrics.register_family(metrics.CounterFamily(
+    "admission_decisions_total", "Admission control decisions", ("group", "outcome")))
+metrics.register_gauges(
+    "admission_in_flight", "Admitted requests in flight per route group", ("group",),
+    lambda: {(group.name,): group.in_flight for group in ROUTE_GROUPS},
+)
+
+
+def _caller_key(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    subject = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM]).get("sub")
+                except JWTError:
+                    subject = None
+                if subject:
+                    return f"user:{subject}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+async def _reject(send, status, detail, retry_after):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, groups=ROUTE_GROUPS, max_keys=ADMISSION_MAX_TRACKED_KEYS):
+        self.app = app
+        self.groups = groups
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # (group, caller) -> TokenBucket, LRU-bounded
+
+    def _bucket(self, group, caller):
+        key = (group.name, caller)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(group.rate, group.burst)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        group = next((g for g in self.groups if path.startswith(g.prefix)), None)
+        if group is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = self._bucket(group, _caller_key(scope)).take()
+        if retry_after:
+            admission_decisions.inc((group.name, "rate_limited"))
+            return await _reject(send, 429, "Too many requests", retry_after)
+        if path.endswith(UNCAPPED_SUFFIXES):
+            admission_decisions.inc((group.name, "admitted"))
+            return await self.app(scope, receive, send)
+        if group.in_flight >= group.max_concurrency:
+            admission_decisions.inc((group.name, "shed"))
+            return await _reject(send, 503, "Server is busy, please retry", 1)
+
+        admission_decisions.inc((group.name, "admitted"))
+        group.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            group.in_flight -= 1
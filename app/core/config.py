@@ -8,8 +8,87 @@ JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-# Fail fast if critical env vars are missing
-if not MONGO_URI:
-    raise ValueError("❌ MONGO_URI is not set in environment variables")
-if not JWT_SECRET_KEY:
-    raise ValueError("❌ JWT_SECRET_KEY is not set in environment variables")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "mybankdb")
+
+
+def validate_settings():
+    """Fail fast if critical env vars are missing.
+
+    Called from the app lifespan (and CLI entry points) rather than at
+    import, so importing the package never raises or does I/O.
+    """
+    if not MONGO_URI:
+        raise ValueError("❌ MONGO_URI is not set in environment variables")
+    if not JWT_SECRET_KEY:
+        raise ValueError("❌ JWT_SECRET_KEY is not set in environment variables")
+
+# Authenticated principal cache (see app/auth/cache.py)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+
+# Password hashing (see app/auth/passwords.py)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+
+# Interest accrual job (see app/accounts/interest.py); rates are annual
+SAVINGS_INTEREST_RATE = float(os.getenv("SAVINGS_INTEREST_RATE", 0.02))
+FIXED_DEPOSIT_INTEREST_RATE = float(os.getenv("FIXED_DEPOSIT_INTEREST_RATE", 0.05))
+ACCRUAL_BATCH_SIZE = int(os.getenv("ACCRUAL_BATCH_SIZE", 10000))
+# Accounts per write transaction; small enough to stay clear of live
+# deposits' write conflicts and the 60s transaction lifetime
+ACCRUAL_WRITE_CHUNK = int(os.getenv("ACCRUAL_WRITE_CHUNK", 500))
+
+# Per-worker balance cache behind ETag polling (see app/accounts/cache.py).
+# The TTL bounds how stale another worker's writes can look.
+BALANCE_CACHE_SIZE = int(os.getenv("BALANCE_CACHE_SIZE", 50000))
+BALANCE_CACHE_TTL_SECONDS = float(os.getenv("BALANCE_CACHE_TTL_SECONDS", 5))
+
+# MongoDB connection pool and read routing (see app/core/database.py)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+# Read-only routes prefer secondaries no more than this far behind (Mongo's minimum is 90)
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", 90))
+READ_FROM_SECONDARIES = os.getenv("READ_FROM_SECONDARIES", "true").lower() == "true"
+
+# Admission control (see app/core/admission.py). Rates are requests per
+# second per user (or client IP when unauthenticated); concurrency is per
+# worker and route group.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_TRACKED_KEYS = int(os.getenv("ADMISSION_MAX_TRACKED_KEYS", 100000))
+AUTH_RATE_PER_SECOND = float(os.getenv("AUTH_RATE_PER_SECOND", 2))
+AUTH_BURST = int(os.getenv("AUTH_BURST", 10))
+AUTH_MAX_CONCURRENCY = int(os.getenv("AUTH_MAX_CONCURRENCY", 32))
+ACCOUNTS_RATE_PER_SECOND = float(os.getenv("ACCOUNTS_RATE_PER_SECOND", 50))
+ACCOUNTS_BURST = int(os.getenv("ACCOUNTS_BURST", 100))
+ACCOUNTS_MAX_CONCURRENCY = int(os.getenv("ACCOUNTS_MAX_CONCURRENCY", 256))
+
+# Live balance events over SSE (see app/accounts/events.py)
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", 100))
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", 10000))
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", 15))
+# Keep the change stream and replay buffer this long after the last client leaves
+EVENT_IDLE_GRACE_SECONDS = float(os.getenv("EVENT_IDLE_GRACE_SECONDS", 60))
+
+# Response serialization (see app/core/serialization.py)
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", 4096))
+
+# Group commit for hot deposit accounts (see app/accounts/coalescing.py).
+# Comma-separated account ids; empty disables coalescing.
+COALESCED_ACCOUNTS = frozenset(filter(None, (a.strip() for a in os.getenv("COALESCED_ACCOUNTS", "").split(","))))
+COALESCE_WINDOW_MS = float(os.getenv("COALESCE_WINDOW_MS", 5))
+COALESCE_MAX_BATCH = int(os.getenv("COALESCE_MAX_BATCH", 500))
+
+# On-demand request profiling (see app/core/profiling.py). Off by default;
+# when off the middleware is not installed at all. A request is profiled
+# when it sends PROFILE_HEADER with PROFILE_TOKEN as its value, or at random
+# for PROFILE_SAMPLE_RATE of requests.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 1))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", 100 * 1024 * 1024))
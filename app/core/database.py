@@ -1,12 +1,137 @@
-from pymongo import MongoClient
-from app.core.config import MONGO_URI
+# app/core/database.py
+#
+# The client is created lazily on first use instead of at import, so
+# importing the app (workers, tests, CLIs) never touches the network. The
+# module-level collection handles are thin proxies that resolve against the
+# current client.
+#
+# Writes and anything that must see them go to the primary. Read-only routes
+# use the *_read handles, which prefer secondaries within
+# READ_MAX_STALENESS_SECONDS. A client that needs read-your-writes on those
+# routes sends back the X-Operation-Time header from its write. The read
+# then runs in a causally consistent session advanced to that time, so
+# whichever member serves it waits until it has caught up.
 
-client = MongoClient(MONGO_URI)
-db = client["mybankdb"]
+from bson import Timestamp
+from pymongo import AsyncMongoClient
+from pymongo.read_preferences import SecondaryPreferred
+from app.core.config import (
+    MONGO_URI,
+    MONGO_DB_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    READ_MAX_STALENESS_SECONDS,
+    READ_FROM_SECONDARIES,
+    validate_settings,
+)
+from app.core.metrics import mongo_listeners
 
-users_collection = db["users"]
-accounts_collection = db["accounts"]
+_client = None
 
-# Optional: Ensure indexes for performance & uniqueness
-users_collection.create_index("email", unique=True)
-users_collection.create_index("username", unique=True)
+
+def get_client() -> AsyncMongoClient:
+    global _client
+    if _client is None:
+        validate_settings()
+        _client = AsyncMongoClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=mongo_listeners(),
+        )
+    return _client
+
+
+def get_db():
+    return get_client()[MONGO_DB_NAME]
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+class LazyDatabase:
+    def __getitem__(self, name):
+        return get_db()[name]
+
+    def __getattr__(self, attr):
+        return getattr(get_db(), attr)
+
+
+class LazyCollection:
+    def __init__(self, name, read_preference=None):
+        self._name = name
+        self._read_preference = read_preference
+        self._client = None
+        self._collection = None
+
+    def _resolve(self):
+        client = get_client()
+        if self._client is not client:
+            collection = client[MONGO_DB_NAME][self._name]
+            if self._read_preference is not None:
+                collection = collection.with_options(read_preference=self._read_preference)
+            self._client, self._collection = client, collection
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self._name!r})"
+
+
+def start_causal_session():
+    return get_client().start_session(causal_consistency=True)
+
+
+async def run_in_transaction(callback, session=None):
+    """Run `callback(session)` in a transaction and return its result.
+
+    Joins the caller's transaction when `session` is already in one, so
+    composed operations (a transfer's two legs) commit together. Otherwise a
+    transaction is started on `session`, or on a fresh session. with_transaction
+    retries transient errors and unknown commit results. Needs a replica set.
+    """
+    if session is not None and session.in_transaction:
+        return await callback(session)
+    if session is not None:
+        return await session.with_transaction(callback)
+    async with get_client().start_session() as session:
+        return await session.with_transaction(callback)
+
+
+def format_operation_time(session):
+    ts = session.operation_time
+    return f"{ts.time}.{ts.inc}" if ts else None
+
+
+def parse_operation_time(value):
+    try:
+        seconds, increment = value.split(".")
+        return Timestamp(int(seconds), int(increment))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid operation time")
+
+
+db = LazyDatabase()
+
+users_collection = LazyCollection("users")
+accounts_collection = LazyCollection("accounts")
+transactions_collection = LazyCollection("transactions")  # append-only ledger
+rollups_collection = LazyCollection("daily_balances")  # per-account daily summaries
+
+_secondary = SecondaryPreferred(max_staleness=READ_MAX_STALENESS_SECONDS) if READ_FROM_SECONDARIES else None
+accounts_read_collection = LazyCollection("accounts", read_preference=_secondary)
+transactions_read_collection = LazyCollection("transactions", read_preference=_secondary)
+rollups_read_collection = LazyCollection("daily_balances", read_preference=_secondary)
+
+# Indexes are declared in app/core/indexes.py and built by running
+# `python -m app.core.indexes` once per deployment, not on every boot.
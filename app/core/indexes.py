@@ -0,0 +1,167 @@
+# app/core/indexes.py
+#
+# Declared index catalog. This is the single source of truth for which
+# indexes each collection should have. reconcile_indexes() brings the live
+# database in line with it, and check_query_plans() verifies with explain()
+# that every query shape the routes issue is served by an index. Run it once
+# per deployment; the app does not build indexes on startup.
+#
+#   python -m app.core.indexes              # create missing indexes
+#   python -m app.core.indexes --drop-extra # also drop undeclared/changed ones
+#   python -m app.core.indexes --explain    # fail if any route query COLLSCANs
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.core.database import db, close_client
+
+INDEX_CATALOG = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_1", unique=True),
+    ],
+    "accounts": [
+        # One account per type per owner; enforced here rather than by a racy pre-check
+        IndexModel([("owner_id", ASCENDING), ("account_type", ASCENDING)], name="owner_type_unique", unique=True),
+        # Per-owner listings, newest last
+        IndexModel([("owner_id", ASCENDING), ("created_at", ASCENDING)], name="owner_created"),
+        # Maturity scans only ever look at fixed deposits
+        IndexModel(
+            [("maturity_date", ASCENDING)],
+            name="fixed_maturity",
+            partialFilterExpression={"account_type": "fixed"},
+        ),
+    ],
+    "transactions": [
+        # History pages are keyset-paginated on (timestamp, _id) within an account
+        IndexModel(
+            [("account_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+            name="account_timestamp",
+        ),
+    ],
+    "daily_balances": [
+        # One rollup row per account per day; also the $merge key for backfills
+        IndexModel([("account_id", ASCENDING), ("day", ASCENDING)], name="account_day_unique", unique=True),
+    ],
+}
+
+# Options that define an index; anything else in index_information() is noise
+_SIGNIFICANT_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _spec(document):
+    key = list(document["key"].items())
+    return key, {opt: document[opt] for opt in _SIGNIFICANT_OPTIONS if opt in document}
+
+
+async def reconcile_indexes(database=None, drop_extra=False):
+    """Create declared indexes that are missing.
+
+    With drop_extra, indexes not in the catalog (or whose definition
+    changed) are dropped and recreated. Returns a per-collection report.
+    """
+    database = database if database is not None else db
+    report = {}
+    for name, models in INDEX_CATALOG.items():
+        collection = database[name]
+        live = {}
+        async for info in await collection.list_indexes():
+            if info["name"] != "_id_":
+                live[info["name"]] = _spec(info)
+
+        declared = {model.document["name"]: model for model in models}
+        missing, changed, extra = [], [], []
+        for index_name, model in declared.items():
+            if index_name not in live:
+                missing.append(model)
+            elif live[index_name] != _spec(model.document):
+                changed.append(model)
+        extra = [index_name for index_name in live if index_name not in declared]
+
+        if drop_extra:
+            for index_name in extra + [m.document["name"] for m in changed]:
+                await collection.drop_index(index_name)
+            missing.extend(changed)
+            changed = []
+        if missing:
+            await collection.create_indexes(missing)
+
+        report[name] = {
+            "created": [m.document["name"] for m in missing],
+            "changed": [m.document["name"] for m in changed],
+            "dropped" if drop_extra else "extra": extra,
+        }
+    return report
+
+
+# Query shapes issued by the routes, with placeholder values. Keep in sync
+# with app/accounts and app/auth when adding queries.
+def route_queries():
+    some_id = ObjectId()
+    return [
+        ("account by id and owner", "accounts", {"_id": some_id, "owner_id": some_id}, None),
+        ("account by owner and type", "accounts", {"owner_id": some_id, "account_type": "savings"}, None),
+        ("accounts overview", "accounts", {"owner_id": some_id}, [("created_at", ASCENDING)]),
+        ("matured fixed deposits", "accounts",
+         {"account_type": "fixed", "maturity_date": {"$lte": datetime.now()}}, None),
+        ("ledger page", "transactions", {"account_id": some_id},
+         [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        ("daily rollups", "daily_balances",
+         {"account_id": some_id, "day": {"$gte": datetime(2000, 1, 1), "$lte": datetime.now()}}, None),
+        ("user by id", "users", {"_id": some_id}, None),
+        ("user by email", "users", {"email": "someone@example.com"}, None),
+    ]
+
+
+def _stages(plan):
+    yield plan.get("stage")
+    for child in ("inputStage", "queryPlan"):
+        if child in plan:
+            yield from _stages(plan[child])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def check_query_plans(database=None):
+    """Return (description, stages) for every route query whose plan scans the collection."""
+    database = database if database is not None else db
+    failures = []
+    for description, name, query, sort in route_queries():
+        cursor = database[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = [s for s in _stages(explain["queryPlanner"]["winningPlan"]) if s]
+        if "COLLSCAN" in stages:
+            failures.append((description, stages))
+    return failures
+
+
+async def _main(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile declared MongoDB indexes")
+    parser.add_argument("--drop-extra", action="store_true", help="drop undeclared or changed indexes")
+    parser.add_argument("--explain", action="store_true", help="verify route queries use an index")
+    args = parser.parse_args(argv)
+
+    try:
+        for name, result in (await reconcile_indexes(drop_extra=args.drop_extra)).items():
+            print(f"{name}: {result}")
+
+        if args.explain:
+            failures = await check_query_plans()
+            for description, stages in failures:
+                print(f"COLLSCAN: {description} -> {stages}")
+            if failures:
+                return 1
+            print("All route queries use an index")
+        return 0
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
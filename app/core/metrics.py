@@ -0,0 +1,211 @@
+# app/core/metrics.py
+#
+# Minimal in-process metrics with Prometheus text exposition. Recording is
+# a dict lookup plus a bisect, so it is cheap enough for every request and
+# every Mongo command. Nothing is exported until /metrics is scraped.
+
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from pymongo import monitoring
+
+# Seconds; covers sub-millisecond cache hits through multi-second bcrypt queues
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class HistogramFamily:
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.children = {}
+
+    def observe(self, labels, value):
+        child = self.children.get(labels)
+        if child is None:
+            child = self.children[labels] = Histogram(self.buckets)
+        child.observe(value)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, child in sorted(self.children.items()):
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{base}{"," if base else ""}le="+Inf"}} {child.count}'
+            yield f"{self.name}_sum{{{base}}} {child.sum}"
+            yield f"{self.name}_count{{{base}}} {child.count}"
+
+
+class CounterFamily:
+    def __init__(self, name, help_text, label_names, kind="counter"):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.kind = kind
+        self.values = defaultdict(float)
+
+    def inc(self, labels, amount=1):
+        self.values[labels] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{{{_labels(self.label_names, labels)}}} {value}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+http_request_seconds = HistogramFamily(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"))
+http_in_flight = CounterFamily(
+    "http_requests_in_flight", "Requests currently being handled", ("method",), kind="gauge")
+mongo_command_seconds = HistogramFamily(
+    "mongo_command_duration_seconds", "MongoDB command latency by collection", ("collection", "command"))
+mongo_command_failures = CounterFamily(
+    "mongo_command_failures_total", "Failed MongoDB commands", ("collection", "command"))
+mongo_checkout_seconds = HistogramFamily(
+    "mongo_pool_checkout_seconds", "Time spent waiting for a pooled connection", ("outcome",))
+
+FAMILIES = [http_request_seconds, http_in_flight, mongo_command_seconds, mongo_command_failures,
+            mongo_checkout_seconds]
+
+# name -> (help, callable returning {label_tuple: value}, label names); for
+# state owned elsewhere (caches, pools) that is cheaper to read at scrape time
+_gauge_callbacks = {}
+
+
+def register_family(family):
+    """Export a histogram or counter family defined outside this module."""
+    FAMILIES.append(family)
+    return family
+
+
+def register_gauges(name, help_text, label_names, fn):
+    _gauge_callbacks[name] = (help_text, label_names, fn)
+
+
+def render():
+    lines = []
+    for family in FAMILIES:
+        lines.extend(family.render())
+    for name, (help_text, label_names, fn) in _gauge_callbacks.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in fn().items():
+            lines.append(f"{name}{{{_labels(label_names, labels)}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and in-flight counts per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        http_in_flight.inc((method,))
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.inc((method,), -1)
+            # FastAPI records the matched route in the scope; using its
+            # template keeps label cardinality bounded
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.observe((method, template, str(status["code"])), time.perf_counter() - start)
+
+
+# MongoDB
+
+class CommandTimingListener(monitoring.CommandListener):
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        if event.command_name == "getMore":
+            collection = event.command.get("collection", "")
+        else:
+            collection = event.command.get(event.command_name)
+            collection = collection if isinstance(collection, str) else ""
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def _finish(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        labels = (collection, event.command_name)
+        mongo_command_seconds.observe(labels, event.duration_micros / 1e6)
+        return labels
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        mongo_command_failures.inc(self._finish(event))
+
+
+class PoolTimingListener(monitoring.ConnectionPoolListener):
+    def connection_checked_out(self, event):
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            mongo_checkout_seconds.observe(("ok",), duration)
+
+    def connection_check_out_failed(self, event):
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            mongo_checkout_seconds.observe((event.reason,), duration)
+
+    # Required by the interface, not measured
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_checked_in(self, event): pass
+
+
+def mongo_listeners():
+    return [CommandTimingListener(), PoolTimingListener()]
@@ -0,0 +1,153 @@
+# app/core/profiling.py
+#
+# Opt-in, per-request statistical profiling for production.
+#
+# Only installed when PROFILING_ENABLED is set, so a disabled deployment
+# pays nothing. A request is profiled when it carries PROFILE_HEADER with
+# the shared PROFILE_TOKEN as its value, or when it is picked at random at
+# PROFILE_SAMPLE_RATE. While it runs, a background thread samples the event
+# loop thread's stack every PROFILE_INTERVAL_MS. Handlers, async
+# dependencies such as get_current_user, and Pydantic validation all run on
+# that thread. Sync code offloaded to the threadpool is not sampled.
+#
+# Each profile is written to PROFILE_DIR in collapsed-stack format, one
+# "frame;frame;frame count" line per stack. That is the input format of
+# flamegraph.pl, speedscope and inferno. Files are named after the start
+# time, worker pid and route template. The oldest are deleted once the directory grows
+# past PROFILE_MAX_BYTES. The file name is returned in X-Profile-Id.
+#
+# One profile runs at a time per worker. Concurrent requests share the loop
+# thread, so their frames show up in the same samples. Profile under low
+# concurrency, or read the result as "what the worker was doing".
+
+import asyncio
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from app.core.config import (
+    PROFILE_HEADER,
+    PROFILE_TOKEN,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_INTERVAL_MS,
+    PROFILE_DIR,
+    PROFILE_MAX_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_DEPTH = 128
+
+
+def _frame_label(code):
+    path = Path(code.co_filename)
+    where = "/".join(path.parts[-2:])
+    return f"{code.co_name} ({where}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler(threading.Thread):
+    """Collects collapsed stacks of one thread until stopped."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        labels = {}  # code object -> label; sampling must stay cheap
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+
+def write_profile(directory, name, stacks, max_bytes=PROFILE_MAX_BYTES):
+    """Write one collapsed-stack file, then trim the oldest files over the cap."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.items()))
+
+    files = sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in files)
+    for old in files:
+        if total <= max_bytes or old == path:
+            break
+        total -= old.stat().st_size
+        old.unlink(missing_ok=True)
+    return path
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling requests selected by header or sampling."""
+
+    def __init__(self, app, header=PROFILE_HEADER, token=PROFILE_TOKEN,
+                 sample_rate=PROFILE_SAMPLE_RATE, interval_ms=PROFILE_INTERVAL_MS, directory=PROFILE_DIR):
+        self.app = app
+        self.header = header.lower().encode()
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.directory = directory
+        self._active = False
+
+    def _selected(self, scope):
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == self.header:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active or not self._selected(scope):
+            return await self.app(scope, receive, send)
+
+        self._active = True
+        started = time.time()
+        name = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # Name the file now so the client can be told where to find it
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+                name["file"] = f"{int(started * 1000)}-{os.getpid()}-{scope['method']}-{slug}.folded"
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", name["file"].encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            stacks = sampler.stop()
+            self._active = False
+            # Written even when empty (a request faster than one sampling
+            # interval), so X-Profile-Id never names a missing file
+            if "file" in name:
+                try:
+                    await asyncio.to_thread(write_profile, self.directory, name["file"], stacks)
+                except OSError:
+                    logger.exception("Could not write profile %s", name["file"])
@@ -0,0 +1,88 @@
+# app/core/serialization.py
+#
+# Fast response path for hot endpoints.
+#
+# ORJSONResponse is the app-wide default response class. Handlers that
+# already hold trusted dicts built by our own code can return render()
+# instead of a dict. That skips FastAPI's jsonable_encoder pass and the
+# response_model re-validation; the response_model stays on the route for
+# the OpenAPI schema. Clients that prefer application/msgpack in their
+# Accept header get MessagePack instead. msgpack is in requirements.txt;
+# without it every response is JSON.
+# Compression of large bodies is left to GZipMiddleware in app/main.py.
+
+from datetime import date, datetime
+from bson import ObjectId
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _msgpack_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default, use_bin_type=True, datetime=False)
+
+
+def _media_ranges(accept):
+    """(media range, q) pairs from an Accept header, skipping malformed ones."""
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = [piece.strip() for piece in part.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = None
+        if q is not None:
+            ranges.append((media_range.lower(), q))
+    return ranges
+
+
+def _quality(ranges, media_type, wildcards=True):
+    # The most specific matching range decides, per RFC 9110
+    candidates = {media_type}
+    if wildcards:
+        candidates |= {media_type.split("/")[0] + "/*", "*/*"}
+    matches = [(media_range.count("*"), q) for media_range, q in ranges if media_range in candidates]
+    return min(matches)[1] if matches else 0.0
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True when the client prefers MessagePack at least as much as JSON.
+
+    MessagePack has to be named explicitly; wildcards only ever select JSON.
+    """
+    if msgpack is None:
+        return False
+    ranges = _media_ranges(request.headers.get("accept", ""))
+    msgpack_q = max(_quality(ranges, media_type, wildcards=False) for media_type in MSGPACK_MEDIA_TYPES)
+    return msgpack_q > 0 and msgpack_q >= _quality(ranges, "application/json")
+
+
+def render(request: Request, content, status_code=200, headers=None) -> Response:
+    """Serialize trusted content directly, negotiating JSON or MessagePack."""
+    response_class = MsgPackResponse if wants_msgpack(request) else ORJSONResponse
+    response = response_class(content, status_code=status_code, headers=headers)
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    return response
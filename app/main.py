@@ -1,9 +1,55 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from app.auth.routes import router as auth_router
 from app.accounts.routes import router as accounts_router
+from app.core.config import validate_settings, ADMISSION_ENABLED, GZIP_MINIMUM_SIZE, PROFILING_ENABLED
+from app.core.database import get_client, close_client
+from app.auth.passwords import shutdown_pool, pool_stats
+from app.auth.utils import principal_cache
+from app.accounts.cache import balance_cache
+from app.accounts.events import event_hub
+from app.accounts.coalescing import deposit_coalescer
+from app.core import metrics
+from app.core.admission import AdmissionMiddleware
+from app.core.profiling import ProfilingMiddleware
 
-app = FastAPI(title="Bank Account Management System", version="1.0.0", debug=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # No I/O here: the client only opens connections on its first operation,
+    # and indexes are built by `python -m app.core.indexes`
+    validate_settings()
+    get_client()
+    yield
+    event_hub.stop()
+    await deposit_coalescer.drain()
+    shutdown_pool()
+    await close_client()
+
+
+app = FastAPI(
+    title="Bank Account Management System",
+    version="1.0.0",
+    debug=True,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# Innermost, so profiles cover routing, dependencies and the handler. Not
+# installed at all unless enabled.
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Only bodies above the threshold are worth the CPU; event streams are skipped
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+# Reject over-limit callers before any routing or dependency work. Added
+# before CORS so rejections still carry CORS headers.
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,9 +59,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it wraps the other middleware and their cost is included
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(auth_router, tags=["Authentication"])
 app.include_router(accounts_router, tags=["Accounts"])
 
+metrics.register_gauges(
+    "cache_events", "Cache hits, misses and size", ("cache", "event"),
+    lambda: {
+        (name, event): value
+        for name, cache in (("principal", principal_cache), ("balance", balance_cache))
+        for event, value in cache.stats().items()
+    },
+)
+metrics.register_gauges(
+    "password_pool", "bcrypt worker pool state", ("field",),
+    lambda: {(field,): value for field, value in pool_stats().items()},
+)
+metrics.register_gauges(
+    "deposit_coalescer", "Coalesced deposit flushes, deposits and queue depth", ("field",),
+    lambda: {(field,): value for field, value in deposit_coalescer.stats().items()},
+)
+
 @app.get("/", tags=["Root"])
-def read_root():
+async def read_root():
     return {"message": "Welcome to the Bank Account Management System API!"}
+
+
+@app.get("/metrics", tags=["Root"], response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
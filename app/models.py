@@ -1,11 +1,8 @@
 # app/models.py
-from passlib.context import CryptContext
 from bson import ObjectId
 from datetime import datetime
-from app.core.database import db
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-users_collection = db["users"]
+from app.core.database import users_collection
+from app.auth.passwords import pwd_context, hash_password_async
 
 class User:
     @staticmethod
@@ -22,7 +19,7 @@ class User:
             "_id": str(ObjectId()),
             "email": email,
             "username": username,
-            "password": User.hash_password(password),  # keep as "password" to match routes
+            "password": await hash_password_async(password),  # keep as "password" to match routes
             "created_at": datetime.utcnow()
         }
         await users_collection.insert_one(user_data)
@@ -0,0 +1,237 @@
+# app/onboarding.py
+#
+# Bulk customer and account onboarding, e.g. when migrating a partner bank.
+#
+#   python -m app.onboarding customers.csv [--format csv|ndjson] [--workers N]
+#
+# Each input row is one customer, with columns email, username, password and
+# optionally account_type and initial_deposit. Rows are streamed in batches:
+# - passwords are hashed across a process pool with the same pwd_context as
+#   /auth/register
+# - accounts are checked with the same opening rules as /accounts/create
+# - users, then accounts, go in with unordered insert_many
+# Per-row problems (bad input, rule violations, duplicate email/username)
+# are written to an NDJSON report instead of stopping the run.
+#
+# Progress is checkpointed after every batch. Rerunning the same command
+# skips finished batches. Rows from a batch that was interrupted half-way
+# are recognised by their import_id and not reported as duplicates.
+
+import argparse
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from app.auth.passwords import hash_password
+from app.auth.schemas import UserCreate
+from app.accounts.logic import new_account_document
+from app.core.database import users_collection, accounts_collection, close_client
+
+DUPLICATE_KEY = 11000
+
+
+def read_rows(path, fmt):
+    with open(path, newline="", encoding="utf-8") as handle:
+        if fmt == "csv":
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _validate(row):
+    """Apply the /auth/register schema to a row."""
+    try:
+        return UserCreate(
+            username=(row.get("username") or "").strip(),
+            email=(row.get("email") or "").strip(),
+            password=row.get("password") or "",
+        )
+    except ValidationError as e:
+        error = e.errors()[0]
+        raise ValueError(f"{error['loc'][0]}: {error['msg']}")
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.state = json.loads(self.path.read_text()) if self.path.exists() else {"rows_done": 0}
+
+    @property
+    def rows_done(self):
+        return self.state["rows_done"]
+
+    def advance(self, rows_done, **counts):
+        self.state["rows_done"] = rows_done
+        for key, value in counts.items():
+            self.state[key] = self.state.get(key, 0) + value
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state))
+        os.replace(tmp, self.path)
+
+
+async def _insert_users(docs, import_id):
+    """Insert users; return ({index: error}, resumed indexes), indexing into docs."""
+    errors = {}
+    try:
+        await users_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details["writeErrors"]:
+            if error["code"] == DUPLICATE_KEY:
+                field = next(iter(error.get("keyValue") or {"email": None}))
+                errors[error["index"]] = f"Duplicate {field}"
+            else:
+                errors[error["index"]] = error["errmsg"]
+
+    # Duplicates that this import wrote in an interrupted earlier run are
+    # already done, not conflicts. A repeat of a row from this same batch is.
+    written_now = {doc["_id"] for i, doc in enumerate(docs) if i not in errors}
+    duplicated = {docs[i]["email"]: i for i, message in errors.items() if message.startswith("Duplicate")}
+    resumed = set()
+    if duplicated:
+        async for user in users_collection.find(
+            {"email": {"$in": list(duplicated)}, "import_id": import_id}, {"email": 1}
+        ):
+            if user["_id"] in written_now:
+                continue
+            index = duplicated[user["email"]]
+            docs[index]["_id"] = user["_id"]
+            del errors[index]
+            resumed.add(index)
+    return errors, resumed
+
+
+async def _insert_accounts(docs):
+    errors = {}
+    try:
+        await accounts_collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details["writeErrors"]:
+            errors[error["index"]] = (error["code"], error["errmsg"])
+    return errors
+
+
+async def import_batch(rows, first_row, pool, import_id, report):
+    valid, account_docs = [], []
+    failed = 0
+
+    def reject(row_number, email, message):
+        nonlocal failed
+        failed += 1
+        report.write(json.dumps({"row": row_number, "email": email, "error": message}) + "\n")
+
+    # Validate everything cheaply before spending CPU on bcrypt
+    for offset, row in enumerate(rows):
+        row_number = first_row + offset
+        try:
+            user = _validate(row)
+            account = None
+            if (row.get("account_type") or "").strip():
+                account = new_account_document(row["account_type"].strip(), None, float(row.get("initial_deposit") or 0))
+        except ValueError as e:
+            reject(row_number, row.get("email"), str(e))
+            continue
+        valid.append((row_number, user, account))
+
+    loop = asyncio.get_running_loop()
+    hashes = await loop.run_in_executor(
+        None, lambda: list(pool.map(hash_password, [user.password for _, user, _ in valid], chunksize=16))
+    )
+
+    now = datetime.now()
+    user_docs = [
+        {"_id": ObjectId(), "username": user.username, "email": user.email,
+         "password": hashed, "import_id": import_id, "created_at": now}
+        for (_, user, _), hashed in zip(valid, hashes)
+    ]
+    user_errors, resumed = await _insert_users(user_docs, import_id) if user_docs else ({}, set())
+
+    owners = []
+    for index, ((row_number, user, account), doc) in enumerate(zip(valid, user_docs)):
+        if index in user_errors:
+            reject(row_number, user.email, user_errors[index])
+        elif account is not None:
+            account["owner_id"] = doc["_id"]
+            account_docs.append(account)
+            owners.append((row_number, user.email, index in resumed))
+
+    account_errors = await _insert_accounts(account_docs) if account_docs else {}
+    accounts = len(account_docs)
+    for index, (code, message) in account_errors.items():
+        accounts -= 1
+        row_number, email, was_resumed = owners[index]
+        # A resumed user's account was already written by the interrupted run
+        if code == DUPLICATE_KEY and was_resumed:
+            continue
+        reject(row_number, email, "Duplicate account" if code == DUPLICATE_KEY else message)
+
+    return {
+        "users": len(user_docs) - len(user_errors) - len(resumed),
+        "accounts": accounts,
+        "resumed": len(resumed),
+        "failed": failed,
+    }
+
+
+async def run_import(path, fmt, batch_size, workers, import_id, report_path):
+    checkpoint = Checkpoint(f"{path}.checkpoint")
+    rows = read_rows(path, fmt)
+    skipped = checkpoint.rows_done
+    for _ in islice(rows, skipped):
+        pass
+    if skipped:
+        print(f"Resuming after row {skipped}")
+
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        with open(report_path, "a", encoding="utf-8") as report:
+            row_number = skipped + 1
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                counts = await import_batch(batch, row_number, pool, import_id, report)
+                report.flush()
+                row_number += len(batch)
+                checkpoint.advance(row_number - 1, **counts)
+                print(f"rows {row_number - 1}: {counts}")
+    finally:
+        pool.shutdown()
+    return checkpoint.state
+
+
+async def _main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import customers and accounts")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--import-id", help="defaults to the input file name")
+    parser.add_argument("--report", help="NDJSON file for per-row errors (default: <path>.errors.ndjson)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    try:
+        state = await run_import(
+            args.path, fmt, args.batch_size, args.workers,
+            args.import_id or Path(args.path).name,
+            args.report or f"{args.path}.errors.ndjson",
+        )
+        print(f"Done: {state}")
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,41 @@
+"""Save benchmark results as a baseline and compare later runs against it."""
+
+import json
+from pathlib import Path
+
+
+def save(path, results):
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True))
+    print(f"baseline saved to {path}")
+
+
+def compare(path, results, threshold, higher_is_worse, counts=()):
+    """Print a comparison and return the list of regressed metric names.
+
+    `results` and the baseline map name -> {metric: value}. `higher_is_worse`
+    maps a metric to True when an increase is a regression (latency) and
+    False when a decrease is (throughput). `counts` names metrics such as
+    error counts, where any increase is a regression whatever the threshold.
+    Metrics not listed are ignored.
+    """
+    baseline = json.loads(Path(path).read_text())
+    regressions = []
+    for name, metrics in sorted(results.items()):
+        before = baseline.get(name)
+        if not before:
+            continue
+        for metric, worse_if_higher in higher_is_worse.items():
+            if metric not in metrics or not before.get(metric):
+                continue
+            change = (metrics[metric] - before[metric]) / before[metric]
+            regressed = change > threshold if worse_if_higher else change < -threshold
+            flag = "REGRESSION" if regressed else ""
+            print(f"{name:<40} {metric:<12} {before[metric]:>12.3f} -> {metrics[metric]:>12.3f} "
+                  f"({change:+.1%}) {flag}")
+            if regressed:
+                regressions.append(f"{name}:{metric}")
+        for metric in counts:
+            if metrics.get(metric, 0) > before.get(metric, 0):
+                print(f"{name:<40} {metric:<12} {before.get(metric, 0):>12} -> {metrics[metric]:>12} REGRESSION")
+                regressions.append(f"{name}:{metric}")
+    return regressions
@@ -0,0 +1,84 @@
+"""Cold-start benchmark: `import app.main` and time to first request.
+
+Each sample runs in a fresh interpreter so nothing is warm. The first
+request goes through the app's lifespan startup and a GET / over a bare
+ASGI call, so no server or network is involved. Dummy settings are filled
+in when the environment has none; startup must not need a reachable Mongo.
+
+    python benchmarks/cold_start.py [--runs 10]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PROBE = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import app.main
+t_import = time.perf_counter() - t0
+
+async def first_request():
+    asgi = app.main.app
+    startup = asyncio.Queue()
+    await startup.put({"type": "lifespan.startup"})
+    lifespan_ready = asyncio.Event()
+
+    async def lifespan_send(message):
+        if message["type"].startswith("lifespan.startup"):
+            lifespan_ready.set()
+
+    lifespan = asyncio.create_task(asgi({"type": "lifespan", "asgi": {"version": "3.0"}}, startup.get, lifespan_send))
+    await lifespan_ready.wait()
+
+    status = {}
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/", "raw_path": b"/", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    await asgi(scope, receive, send)
+    await startup.put({"type": "lifespan.shutdown"})
+    await lifespan
+    return status.get("code")
+
+code = asyncio.run(first_request())
+print(json.dumps({"import": t_import, "first_request": time.perf_counter() - t0, "status": code}))
+"""
+
+
+def sample():
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://127.0.0.1:1")
+    env.setdefault("JWT_SECRET_KEY", "benchmark-only")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    for key in ("import", "first_request"):
+        values = [s[key] * 1000 for s in samples]
+        print(f"{key:>14}: median {statistics.median(values):7.1f} ms  "
+              f"min {min(values):7.1f} ms  max {max(values):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""End-to-end load driver for the ASGI app.
+
+Virtual users register, log in, open a current account and then replay a
+weighted mix of deposit, withdraw, balance and history calls in-process
+through httpx's ASGI transport. Each route gets throughput and p50/p95/p99
+latency. Needs a reachable MongoDB replica set, because every balance write
+runs in a transaction. A single-node set is fine (see "Running MongoDB
+locally" in the README). Every run uses a throwaway database, which is
+dropped at the end. The run fails if any route returned errors.
+
+    MONGO_URI="mongodb://localhost:27017/?replicaSet=rs0" python benchmarks/load.py \\
+        --users 50 --requests 20 [--save load.json | --compare load.json]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/?replicaSet=rs0")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only")
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+# Every virtual user comes from 127.0.0.1, so the per-IP auth bucket would
+# throttle the signups. Set ADMISSION_ENABLED=true to measure with it on.
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+os.environ["MONGO_DB_NAME"] = f"bench_{uuid.uuid4().hex[:8]}"
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.core.database import get_client, close_client  # noqa: E402
+from app.core.config import MONGO_DB_NAME  # noqa: E402
+from app.core.indexes import reconcile_indexes  # noqa: E402
+from app.auth.passwords import shutdown_pool  # noqa: E402
+
+import baseline  # noqa: E402
+
+MIX = {"deposit": 35, "withdraw": 15, "balance": 35, "transactions": 15}
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.abandoned = defaultdict(int)
+
+    async def call(self, route, send):
+        start = time.perf_counter()
+        response = await send()
+        self.samples[route].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    def abandon(self, step, response):
+        # A virtual user that cannot sign up has nothing to replay
+        self.abandoned[f"{step}: {response.status_code}"] += 1
+
+
+async def virtual_user(client, recorder, requests, rng):
+    email = f"{uuid.uuid4().hex}@bench.example.com"
+    creds = {"username": email.split("@")[0], "email": email, "password": "bench-password"}
+    registered = await recorder.call("POST /auth/register", lambda: client.post("/auth/register", json=creds))
+    if registered.status_code != 200:
+        return recorder.abandon("register", registered)
+    login = await recorder.call(
+        "POST /auth/login",
+        lambda: client.post("/auth/login", json={"email": email, "password": creds["password"]}),
+    )
+    if login.status_code != 200:
+        return recorder.abandon("login", login)
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    created = await client.post(
+        "/accounts/create", params={"account_type": "current", "initial_deposit": 1000}, headers=headers
+    )
+    if created.status_code != 200:
+        return recorder.abandon("create account", created)
+    account = created.json()["account_id"]
+
+    routes = list(MIX)
+    weights = list(MIX.values())
+    for _ in range(requests):
+        kind = rng.choices(routes, weights)[0]
+        if kind in ("deposit", "withdraw"):
+            amount = round(rng.uniform(1, 50), 2)
+            await recorder.call(
+                f"POST /accounts/{{id}}/{kind}",
+                lambda: client.post(f"/accounts/{account}/{kind}", params={"amount": amount}, headers=headers),
+            )
+        else:
+            await recorder.call(
+                f"GET /accounts/{{id}}/{kind}",
+                lambda: client.get(f"/accounts/{account}/{kind}", headers=headers),
+            )
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(recorder, elapsed):
+    report = {}
+    for route, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        report[route] = {
+            "count": len(ordered),
+            "errors": recorder.errors[route],
+            "rps": len(ordered) / elapsed,
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p95_ms": percentile(ordered, 95) * 1000,
+            "p99_ms": percentile(ordered, 99) * 1000,
+        }
+        r = report[route]
+        print(f"{route:<34} n={r['count']:>6} err={r['errors']:>4} {r['rps']:>9.1f} req/s  "
+              f"p50 {r['p50_ms']:7.2f}  p95 {r['p95_ms']:7.2f}  p99 {r['p99_ms']:7.2f} ms")
+    return report
+
+
+async def run(args):
+    await reconcile_indexes()
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                virtual_user(client, recorder, args.requests, random.Random(rng.random()))
+                for _ in range(args.users)
+            ))
+            elapsed = time.perf_counter() - start
+    finally:
+        await get_client().drop_database(MONGO_DB_NAME)
+        await close_client()
+        shutdown_pool()
+    print(f"{sum(len(s) for s in recorder.samples.values())} requests in {elapsed:.2f}s")
+    if recorder.abandoned:
+        print(f"virtual users abandoned during setup: {dict(recorder.abandoned)}")
+    return summarize(recorder, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="mixed requests per user after login")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed regression, e.g. 0.25 = 25%%")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    # Failed requests are usually fast, so errors can pass for a speed-up
+    failing = [route for route, r in report.items() if r["errors"]]
+    if args.save and not failing:
+        baseline.save(args.save, report)
+    regressions = []
+    if args.compare:
+        regressions = baseline.compare(
+            args.compare, report, args.threshold, {"p95_ms": True, "p99_ms": True, "rps": False},
+            counts=("errors",),
+        )
+    if failing:
+        sys.exit(f"errors on {len(failing)} route(s): {', '.join(failing)}"
+                 + (" (baseline not saved)" if args.save else ""))
+    if regressions:
+        sys.exit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Micro-benchmarks for the account models and the auth hot path.
+
+No database is needed: get_current_user is measured on a principal cache
+hit, which is the steady state for authenticated traffic.
+
+    python benchmarks/micro.py [--save baseline.json] [--compare baseline.json --threshold 0.2]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URI", "mongodb://127.0.0.1:1")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only")
+
+from bson import ObjectId  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+from app.accounts.models import BankAccount, SavingsAccount, CurrentAccount, FixedDepositAccount  # noqa: E402
+from app.auth.utils import create_access_token, get_current_user, principal_cache  # noqa: E402
+
+import baseline  # noqa: E402
+
+BIG = 10 ** 12  # large enough that guards never trip during a run
+
+
+def model_cases():
+    matured = FixedDepositAccount("bench", BIG)
+    matured.maturity_date = datetime.now() - timedelta(days=1)
+    accounts = {
+        "BankAccount": BankAccount("bench", BIG),
+        "SavingsAccount": SavingsAccount("bench", BIG),
+        "CurrentAccount": CurrentAccount("bench", BIG),
+        "FixedDepositAccount": matured,
+    }
+    cases = {}
+    for name, account in accounts.items():
+        if name != "FixedDepositAccount":
+            cases[f"{name}.deposit"] = (account, lambda a=account: a.deposit(1))
+        cases[f"{name}.withdraw"] = (account, lambda a=account: a.withdraw(1))
+    return cases
+
+
+def auth_cases():
+    user_id = ObjectId()
+    token = create_access_token({"sub": str(user_id), "email": "bench@example.com"})
+    principal_cache.put(str(user_id), {"_id": user_id, "username": "bench", "email": "bench@example.com"})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    loop = asyncio.new_event_loop()
+
+    def current_user_batch(n):
+        async def run():
+            for _ in range(n):
+                await get_current_user(credentials)
+        loop.run_until_complete(run())
+
+    return {
+        "create_access_token": lambda: create_access_token({"sub": str(user_id), "email": "bench@example.com"}),
+    }, {"get_current_user (cache hit)": current_user_batch}
+
+
+def measure(fn, number, repeat):
+    best = min(timeit.repeat(fn, number=number, repeat=repeat))
+    return best / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, e.g. 0.2 = 20%%")
+    args = parser.parse_args()
+
+    results = {}
+    for name, (account, fn) in model_cases().items():
+        account.transactions.clear()
+        results[name] = measure(fn, args.number, args.repeat)
+        account.transactions.clear()
+
+    sync_cases, batched_cases = auth_cases()
+    for name, fn in sync_cases.items():
+        results[name] = measure(fn, args.number // 10, args.repeat)
+    for name, batch in batched_cases.items():
+        n = args.number // 10
+        results[name] = min(timeit.repeat(lambda: batch(n), number=1, repeat=args.repeat)) / n
+
+    report = {}
+    for name, seconds in results.items():
+        report[name] = {"us_per_op": seconds * 1e6, "ops_per_s": 1 / seconds}
+        print(f"{name:<40} {seconds * 1e6:10.2f} us/op {1 / seconds:14,.0f} ops/s")
+
+    if args.save:
+        baseline.save(args.save, report)
+    if args.compare:
+        regressions = baseline.compare(args.compare, report, args.threshold, {"us_per_op": True})
+        if regressions:
+            sys.exit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
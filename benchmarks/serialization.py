@@ -0,0 +1,80 @@
+"""Bytes and CPU per response for the hot payloads, before and after.
+
+"before" is FastAPI's default path: response_model validation, then
+jsonable_encoder, then JSONResponse. "orjson" is render() on a trusted dict.
+msgpack and gzip variants are included when msgpack is installed.
+
+    python benchmarks/serialization.py [--entries 500] [--number 200]
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URI", "mongodb://127.0.0.1:1")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only")
+
+from bson import ObjectId  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from app.accounts.ledger import serialize_entry, encode_cursor  # noqa: E402
+from app.accounts.schema import TransactionPage  # noqa: E402
+from app.core.serialization import MsgPackResponse, msgpack  # noqa: E402
+
+
+def transaction_page(n):
+    now = datetime.now()
+    entries = []
+    balance = 1000.0
+    for i in range(n):
+        amount = round(10 + i % 90 + 0.25, 2)
+        balance += amount if i % 3 else -amount
+        entries.append({
+            "_id": ObjectId(), "timestamp": now - timedelta(minutes=i),
+            "type": "withdrawal" if i % 3 == 0 else "deposit", "amount": amount, "balance": balance,
+        })
+    return {
+        "transactions": [serialize_entry(e) for e in entries],
+        "before": encode_cursor(entries[-1]),
+        "after": None,
+    }
+
+
+def variants(page):
+    def before():
+        validated = TransactionPage.model_validate(page)
+        return JSONResponse(jsonable_encoder(validated)).body
+
+    cases = {
+        "before (validate+jsonable_encoder+json)": before,
+        "orjson (trusted dict)": lambda: ORJSONResponse(page).body,
+        "orjson + gzip": lambda: gzip.compress(ORJSONResponse(page).body, compresslevel=6),
+    }
+    if msgpack is not None:
+        cases["msgpack (trusted dict)"] = lambda: MsgPackResponse(page).body
+        cases["msgpack + gzip"] = lambda: gzip.compress(MsgPackResponse(page).body, compresslevel=6)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=500)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    page = transaction_page(args.entries)
+    print(f"transaction page with {args.entries} entries")
+    for name, fn in variants(page).items():
+        size = len(fn())
+        seconds = min(timeit.repeat(fn, number=args.number, repeat=5)) / args.number
+        print(f"{name:<42} {size:>9,} bytes {seconds * 1e6:>10.1f} us/response")
+
+
+if __name__ == "__main__":
+    main()